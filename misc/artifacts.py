@@ -0,0 +1,257 @@
+"""
+Failure artifacts (screenshot, page HTML, browser console log, recent log lines),
+captured with as few driver calls as possible and written off the test thread.
+
+On the test thread, the collector only fetches raw data: the screenshot as the
+driver's base64 string, the HTML/URL/title in one script call, and the console
+log. Decoding, compressing and writing happen in a background thread pool, so
+a failing test can move on to teardown (and d.quit()) immediately.
+
+Artifacts go to <directory>/<run timestamp>-<pid>/<test>/; the pid keeps parallel
+workers started in the same second apart. Each artifact is capped in size, and
+at the end of a session only the newest runs are kept, within a total size
+budget. Only directories named like a run are ever pruned.
+"""
+
+import base64
+import collections
+import concurrent.futures
+import gzip
+import json
+import logging
+import os
+import re
+import shutil
+import time
+
+import pytest
+
+
+_PAGE_STATE_SCRIPT = """
+return [document.documentElement.outerHTML, window.location.href, document.title];
+"""
+
+# Fixtures starting a browser set item.stash[driver_key] = driver, so a failure while
+#   setting up the page (before the test receives the driver) can still be captured.
+driver_key = pytest.StashKey()
+
+_RUN_DIRECTORY_FORMAT = '%Y%m%d-%H%M%S'
+# Timestamp, then pid (absent for runs from before the pid was added).
+_RUN_DIRECTORY_PATTERN = re.compile(r'^(\d{8}-\d{6})(?:-(\d+))?$')
+
+
+class RecentLogHandler(logging.Handler):
+    """
+    Keeps the last capacity formatted log lines in memory.
+    """
+
+    def __init__(self, capacity=200):
+        super().__init__(level=logging.DEBUG)
+        self.lines = collections.deque(maxlen=capacity)
+        self.setFormatter(logging.Formatter('%(asctime)s %(levelname)-8s %(module)s.%(funcName)s -- %(message)s'))
+        return
+
+    def emit(self, record):
+        try:
+            self.lines.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+        return
+
+
+class ArtifactCollector:
+    """
+    :attribute str run_directory: Where this run's artifacts are written.
+    :attribute int max_artifact_bytes: Larger artifacts are truncated (text) or skipped (images).
+    :attribute RecentLogHandler log_handler:
+    """
+
+    def __init__(self, directory='Artifacts', max_workers=2, max_artifact_bytes=10 * 1024 * 1024, keep_runs=10,
+                 max_total_bytes=500 * 1024 * 1024, log_lines=200):
+        self.directory = directory
+        self.run_directory = os.path.join(directory, f"{time.strftime(_RUN_DIRECTORY_FORMAT)}-{os.getpid()}")
+        self.max_artifact_bytes = max_artifact_bytes
+        self.keep_runs = keep_runs
+        self.max_total_bytes = max_total_bytes
+        self.log_handler = RecentLogHandler(capacity=log_lines)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                               thread_name_prefix='artifact-writer')
+        self._futures = []
+        return
+
+    def attach_log_handler(self):
+        """
+        (Re)attaches the log handler to the root logger. logging.config.dictConfig()
+        replaces the root handlers, so call this after any reconfiguration.
+        """
+        root = logging.getLogger()
+        if self.log_handler not in root.handlers:
+            root.addHandler(self.log_handler)
+        return
+
+    def capture(self, driver, test_name):
+        """
+        Grabs raw failure data from the driver, then hands it to the writer threads.
+
+        :param WebDriver driver:
+        :param str test_name:
+        :returns dict of artifact name -> filename, for the artifacts that will be written
+            (files may still be being written).
+        """
+        test_directory = os.path.join(self.run_directory, re.sub(r'[^A-Za-z0-9_.-]', '_', test_name))
+        paths = {
+            'screenshot': os.path.join(test_directory, 'screenshot.png'),
+            'html': os.path.join(test_directory, 'page.html.gz'),
+            'console': os.path.join(test_directory, 'console.json'),
+            'log': os.path.join(test_directory, 'log.txt'),
+        }
+        raw = {'log': list(self.log_handler.lines)}
+        for name, fetch in (('screenshot', driver.get_screenshot_as_base64),
+                            ('page', lambda: driver.execute_script(_PAGE_STATE_SCRIPT)),
+                            ('console', lambda: driver.get_log('browser'))):
+            try:
+                raw[name] = fetch()
+            except Exception as e:
+                # The driver may be why the test failed; capture whatever still works.
+                logging.warning(f"Could not capture {name} for '{test_name}': {e}")
+                raw[name] = None
+        if raw['screenshot'] is not None:
+            # Decoded size, from the base64 length, so the cap is known before decoding.
+            size = len(raw['screenshot']) * 3 // 4 - raw['screenshot'][-2:].count('=')
+            if size > self.max_artifact_bytes:
+                logging.warning(f"Screenshot for '{test_name}' is {size} bytes; over the cap, not saved.")
+                raw['screenshot'] = None
+
+        self._futures.append(self._executor.submit(self._write, test_directory, paths, raw))
+        sources = {'screenshot': 'screenshot', 'html': 'page', 'console': 'console', 'log': 'log'}
+        return {name: path for name, path in paths.items() if raw[sources[name]] is not None}
+
+    def _write(self, test_directory, paths, raw):
+        os.makedirs(test_directory, exist_ok=True)
+        if raw['screenshot'] is not None:
+            with open(paths['screenshot'], 'wb') as f:
+                f.write(base64.b64decode(raw['screenshot']))
+        if raw['page'] is not None:
+            html, url, title = raw['page']
+            header = f"<!-- {url} | {title} -->\n"
+            data = (header + html).encode('utf-8')[:self.max_artifact_bytes]
+            with gzip.open(paths['html'], 'wb') as f:
+                f.write(data)
+        if raw['console'] is not None:
+            data = json.dumps(raw['console'], indent=1)[:self.max_artifact_bytes]
+            with open(paths['console'], 'w') as f:
+                f.write(data)
+        with open(paths['log'], 'w') as f:
+            f.write('\n'.join(raw['log'])[-self.max_artifact_bytes:])
+        return
+
+    def close(self, prune=True):
+        """
+        Waits for pending writes, then applies the retention policy.
+
+        :param bool prune: Whether to delete old runs.
+        """
+        for future in concurrent.futures.as_completed(self._futures):
+            exception = future.exception()
+            if exception is not None:
+                logging.error(f"Writing failure artifacts failed: {exception}")
+        self._executor.shutdown(wait=True)
+        self._futures = []
+        if prune:
+            self._prune_old_runs()
+        return
+
+    def _prune_old_runs(self):
+        if not os.path.isdir(self.directory):
+            return
+        # Only run directories, so pointing --artifacts-dir at a shared directory can't delete anything else.
+        runs = sorted((i for i in os.listdir(self.directory)
+                       if _RUN_DIRECTORY_PATTERN.match(i) and os.path.isdir(os.path.join(self.directory, i))),
+                      key=_run_sort_key, reverse=True)
+        total_bytes = 0
+        for index, run in enumerate(runs):
+            path = os.path.join(self.directory, run)
+            total_bytes += _directory_size(path)
+            if index >= self.keep_runs or total_bytes > self.max_total_bytes:
+                # The current run is always kept, even if it alone is over budget.
+                if path != self.run_directory:
+                    shutil.rmtree(path, ignore_errors=True)
+        return
+
+
+def _run_sort_key(name):
+    timestamp, pid = _RUN_DIRECTORY_PATTERN.match(name).groups()
+    return timestamp, int(pid or 0)
+
+
+def _directory_size(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            total += os.path.getsize(os.path.join(dirpath, filename))
+    return total
+
+
+def _find_driver(item):
+    driver = item.stash.get(driver_key, None)
+    if driver is not None:
+        return driver
+    for value in getattr(item, 'funcargs', dict()).values():
+        if hasattr(value, 'get_screenshot_as_base64'):
+            return value
+    return None
+
+
+# Pytest Plugin
+
+
+class ArtifactPlugin:
+    """
+    Registered by conftest.py. Captures artifacts when a test's setup (e.g. loading the
+    page) or call phase fails, before fixture teardown quits the driver, and links them
+    from the report.
+    """
+
+    def __init__(self, collector):
+        self.collector = collector
+        self._captured = 0
+        return
+
+    def pytest_runtest_setup(self, item):
+        self.collector.attach_log_handler()
+        return
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_makereport(self, item, call):
+        outcome = yield
+        report = outcome.get_result()
+        if report.when not in ('setup', 'call') or not report.failed or item.get_closest_marker('xfail') is not None:
+            return
+        driver = _find_driver(item)
+        if driver is None:
+            return
+        paths = self.collector.capture(driver, item.nodeid)
+        self._captured += 1
+        report.sections.append(('failure artifacts', '\n'.join(f"{k}: {v}" for k, v in paths.items())))
+        item.user_properties.append(('failure_artifacts', json.dumps(paths)))
+        try:
+            import pytest_html
+        except ImportError:
+            return
+        extras = getattr(report, 'extras', [])
+        for name, path in paths.items():
+            extras.append(pytest_html.extras.url(os.path.abspath(path), name=name))
+        report.extras = extras
+        return
+
+    def pytest_sessionfinish(self, session):
+        # Nothing ran when only collecting, so leave earlier runs alone.
+        self.collector.close(prune=not session.config.getoption('collectonly'))
+        return
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if self._captured == 0:
+            return
+        terminalreporter.write_sep('-', 'failure artifacts')
+        terminalreporter.write_line(f"{self._captured} failing tests captured to {self.collector.run_directory}.")
+        return
@@ -0,0 +1,317 @@
+"""
+Opt-in sampling profiler for steps, writing collapsed-stack (flamegraph) files.
+
+While a profiled step runs, a background thread samples the test thread's
+stack every few milliseconds. Each sample is filed under a category, which
+becomes the root frame of the stack so flamegraphs show them apart:
+* [webdriver] - waiting on a WebDriver command (HTTP round trip to the driver).
+* [sleep] - in time.sleep (e.g. the Loading/Expanding poll loops).
+* [cpu] - everything else, i.e. Python-side work.
+Only the innermost frames decide the category: walking out from the leaf, the
+first WebDriver/HTTP frame makes it [webdriver], and the first frame of this
+repo's own code makes it [cpu].
+
+Samples are also attributed to the innermost page-object method on the stack
+(e.g. Page.click_load_more_button), so summary.json shows which page-object
+calls the time went to without wrapping each method.
+
+Output is one '<test>__<step>.collapsed' file per profiled test and step, in the
+format read by flamegraph.pl and speedscope, plus a summary.json with wall time
+and CPU time (thread_time) per step.
+
+Enable for every test with --profile-steps all (or a comma-separated list of step
+names), or per test with @pytest.mark.profile / @pytest.mark.profile(steps=[...]).
+"""
+
+import collections
+import contextlib
+import dis
+import functools
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+import pytest
+
+from misc import step_hooks
+
+
+_WEBDRIVER_PATHS = (
+    os.path.join('selenium', 'webdriver', 'remote'),
+    os.path.join('urllib3', ''),
+    os.path.join('http', 'client.py'),
+)
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_LIBRARY_DIRECTORIES = ('site-packages', 'dist-packages')
+
+
+class StepProfile:
+    """
+    Samples and timings for one step of one test, accumulated over its calls.
+
+    :attribute collections.Counter stacks: Collapsed stack -> sample count.
+    :attribute collections.Counter page_objects: (page-object method, category) -> sample count.
+    :attribute number wall_time: Seconds.
+    :attribute number cpu_time: Seconds of CPU used by the test thread.
+    :attribute int calls:
+    """
+
+    def __init__(self):
+        self.stacks = collections.Counter()
+        self.page_objects = collections.Counter()
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.calls = 0
+        return
+
+    @property
+    def category_counts(self):
+        counts = collections.Counter()
+        for stack, count in self.stacks.items():
+            counts[stack.split(';', 1)[0]] += count
+        return counts
+
+    @property
+    def page_object_counts(self):
+        """
+        :returns dict: page-object method -> {category: sample count}.
+        """
+        counts = dict()
+        for (method, category), count in self.page_objects.items():
+            counts.setdefault(method, dict())[category] = count
+        return counts
+
+
+class SamplingProfiler:
+    """
+    Step hook (see misc.step_hooks) which samples the calling thread while a step runs.
+
+    Nested steps are covered by the outermost profiled step's sampler.
+
+    :attribute number interval: Seconds between samples.
+    :attribute set steps: Step names (full or unqualified) to profile, or None for all.
+    :attribute dict profiles: (test, step) -> StepProfile.
+    """
+
+    def __init__(self, interval=0.005, steps=None):
+        self.interval = interval
+        self.steps = steps
+        self.profiles = dict()
+        self._active = False
+        return
+
+    def wants(self, step_name):
+        if self.steps is None:
+            return True
+        return step_name in self.steps or step_name.rsplit('.', 1)[-1] in self.steps
+
+    @contextlib.contextmanager
+    def __call__(self, step_name, driver):
+        if self._active or not self.wants(step_name):
+            yield
+            return
+
+        profile = self.profiles.setdefault((step_hooks.current_test(), step_name), StepProfile())
+        stop = threading.Event()
+        sampler = threading.Thread(target=self._sample, args=(threading.get_ident(), profile, stop),
+                                   name='cpu-profiler', daemon=True)
+        self._active = True
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        sampler.start()
+        try:
+            yield
+        finally:
+            profile.cpu_time += time.thread_time() - cpu_start
+            profile.wall_time += time.perf_counter() - wall_start
+            profile.calls += 1
+            stop.set()
+            sampler.join()
+            self._active = False
+
+    def _sample(self, thread_id, profile, stop):
+        while not stop.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                return
+            stack = _collapse(frame)
+            profile.stacks[stack] += 1
+            method = _page_object_method(frame)
+            if method is not None:
+                profile.page_objects[(method, stack.split(';', 1)[0])] += 1
+        return
+
+    # Output
+
+    def write(self, directory):
+        """
+        Writes one .collapsed file per (test, step).
+
+        :returns tuple of (list of filenames written, list of summary dicts).
+        """
+        os.makedirs(directory, exist_ok=True)
+        filenames = []
+        summary = []
+        for (test, step), profile in self.profiles.items():
+            filename = os.path.join(directory, f"{_clean_name(test or 'no_test')}__{_clean_name(step)}.collapsed")
+            with open(filename, 'w') as f:
+                for stack, count in sorted(profile.stacks.items()):
+                    f.write(f"{stack} {count}\n")
+            filenames.append(filename)
+            summary.append({
+                'test': test,
+                'step': step,
+                'calls': profile.calls,
+                'wall_time': profile.wall_time,
+                'cpu_time': profile.cpu_time,
+                'samples': dict(profile.category_counts),
+                'page_objects': profile.page_object_counts,
+            })
+        return filenames, summary
+
+
+def _collapse(frame):
+    """
+    :param frame: Innermost frame of the sampled thread.
+    :returns str: 'category;outermost frame;...;innermost frame'.
+    """
+    category = _category(frame)
+    frames = []
+    while frame is not None:
+        frames.append(_frame_name(frame))
+        frame = frame.f_back
+    frames.append(category)
+    return ';'.join(reversed(frames))
+
+
+def _category(frame):
+    if _is_sleep_call(frame.f_code, frame.f_lasti):
+        return '[sleep]'
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if any(i in filename for i in _WEBDRIVER_PATHS):
+            return '[webdriver]'
+        if _is_project_file(filename):
+            return '[cpu]'
+        frame = frame.f_back
+    return '[cpu]'
+
+
+@functools.lru_cache(maxsize=4096)
+def _is_sleep_call(code, lasti):
+    """
+    Whether the instruction at lasti is a call to a function named 'sleep' loaded on
+    the same line. time.sleep is implemented in C and has no frame of its own, so a
+    sleeping thread's innermost frame is the caller, stopped at the call.
+    """
+    loaded = set()
+    for instruction in dis.get_instructions(code):
+        if instruction.offset == lasti:
+            return instruction.opname.startswith('CALL') and 'sleep' in loaded
+        if instruction.starts_line:
+            loaded = set()
+        if instruction.opname in ('LOAD_GLOBAL', 'LOAD_NAME', 'LOAD_DEREF', 'LOAD_ATTR', 'LOAD_METHOD'):
+            loaded.add(instruction.argval)
+    return False
+
+
+def _is_project_file(filename):
+    if not os.path.abspath(filename).startswith(_PROJECT_ROOT + os.sep):
+        return False
+    return not any(i in filename for i in _LIBRARY_DIRECTORIES)
+
+
+def _page_object_method(frame):
+    """
+    :returns str: Name of the innermost page_objects frame, e.g. 'Page.click_load_more_button'. (Or None.)
+    """
+    while frame is not None:
+        if frame.f_globals.get('__name__', '').startswith('page_objects.'):
+            return getattr(frame.f_code, 'co_qualname', frame.f_code.co_name)
+        frame = frame.f_back
+    return None
+
+
+def _frame_name(frame):
+    # co_qualname (Python 3.11+) includes the class, e.g. Page.click_load_more_button.
+    name = getattr(frame.f_code, 'co_qualname', frame.f_code.co_name)
+    return f"{frame.f_globals.get('__name__', '?')}.{name}"
+
+
+def _clean_name(name):
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', name)
+
+
+# Pytest Plugin
+
+
+class CpuProfilePlugin:
+    """
+    Registered by conftest.py. Profiles tests marked with @pytest.mark.profile, or
+    every test if steps were given on the command line.
+
+    :attribute str directory: Where collapsed-stack files are written.
+    :attribute set steps: Step names from --profile-steps; None if not given; empty for 'all'.
+    """
+
+    def __init__(self, directory, steps=None):
+        self.directory = directory
+        self.steps = steps
+        self.profiler = None
+        self._profiled = []
+        self._summary = []
+        return
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_runtest_setup(self, item):
+        marker = item.get_closest_marker('profile')
+        if marker is None and self.steps is None:
+            return
+        steps = self.steps or None
+        if marker is not None and marker.kwargs.get('steps') is not None:
+            steps = set(marker.kwargs['steps'])
+        self.profiler = SamplingProfiler(steps=steps)
+        step_hooks.add_hook(self.profiler)
+        return
+
+    def pytest_runtest_logreport(self, report):
+        if report.when != 'teardown' or self.profiler is None:
+            return
+        step_hooks.remove_hook(self.profiler)
+        filenames, summary = self.profiler.write(self.directory)
+        self._profiled += filenames
+        self._summary += summary
+        self.profiler = None
+        return
+
+    def pytest_sessionfinish(self, session):
+        if len(self._summary) == 0:
+            return
+        with open(os.path.join(self.directory, 'summary.json'), 'w') as f:
+            json.dump(self._summary, f, indent=1)
+        return
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if len(self._profiled) == 0:
+            return
+        terminalreporter.write_sep('-', 'cpu profile')
+        for entry in self._summary:
+            terminalreporter.write_line(f"{entry['test']} {entry['step']}: wall {entry['wall_time']:.2f}s, "
+                                        f"cpu {entry['cpu_time']:.2f}s, samples {entry['samples']}")
+        terminalreporter.write_line(f"{len(self._profiled)} collapsed-stack files written to {self.directory}.")
+        return
+
+
+def parse_steps_option(value):
+    """
+    :param str value: 'all', or comma-separated step names. (Or None.)
+    :returns set, or None if profiling wasn't requested. An empty set means all steps.
+    """
+    if value is None:
+        return None
+    if value.strip().lower() == 'all':
+        return set()
+    return {i.strip() for i in value.split(',') if i.strip() != ''}
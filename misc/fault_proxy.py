@@ -0,0 +1,525 @@
+"""
+Local HTTP proxy which injects latency and faults into browser traffic.
+
+Point the browser at the proxy (e.g. Chrome's --proxy-server option, see
+conftest.py) to benchmark and stress the wait strategies in page_objects
+under controlled, reproducible network conditions.
+
+Plain HTTP requests are matched against routes by host and path. HTTPS
+traffic is tunneled (CONNECT) without being decrypted, so it can only be
+matched by host:port; faults then apply to the whole tunnel. For per-URL
+faults on HTTPS XHR/fetch requests (e.g. the Pokedex's result requests), use
+inject_xhr_faults(), which applies the same routes inside the browser.
+
+Usage:
+    proxy = FaultProxy(routes=[Route(r'pokemon\\.com', latency=0.3, jitter=0.1)], seed=42)
+    proxy.start()
+    ...
+    proxy.stop()
+
+Or from the command line, with routes described in a JSON file:
+    python -m misc.fault_proxy --port 8899 --seed 42 --routes routes.json
+"""
+
+import argparse
+import http.client
+import http.server
+import json
+import logging
+import re
+import select
+import socket
+import socketserver
+import threading
+import time
+import urllib.parse
+
+
+class Route:
+    """
+    Describes the faults injected into requests matching a pattern.
+
+    :attribute str pattern: Regex searched for in 'host/path' (or 'host:port' for HTTPS tunnels).
+    :attribute number latency: Seconds added before the request is forwarded.
+    :attribute number jitter: Max seconds randomly added to or removed from latency.
+    :attribute int bandwidth: Max response bytes per second. None is unlimited.
+    :attribute number drop_rate: Probability [0, 1] of dropping the request.
+    :attribute number slow_rate: Probability [0, 1] of adding slow_latency to the request.
+    :attribute number slow_latency: Seconds added to slow requests.
+    :attribute bool xhr_only: Only apply to XHR requests. Never matches HTTPS tunnels through the proxy;
+        see inject_xhr_faults() for those.
+    """
+
+    def __init__(self, pattern, latency=0.0, jitter=0.0, bandwidth=None, drop_rate=0.0, slow_rate=0.0,
+                 slow_latency=0.0, xhr_only=False):
+        self.pattern = pattern
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.drop_rate = drop_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.xhr_only = xhr_only
+        self._regex = re.compile(pattern)
+        return
+
+    @classmethod
+    def from_dict(cls, values):
+        return cls(**values)
+
+    def matches(self, target, is_xhr=False):
+        if self.xhr_only and not is_xhr:
+            return False
+        return self._regex.search(target) is not None
+
+    def __str__(self):
+        return f"Route '{self.pattern}'"
+
+
+class Fault:
+    """
+    The faults decided for a single request.
+
+    :attribute number delay: Seconds to wait before forwarding.
+    :attribute bool drop: Whether the request is dropped.
+    :attribute int bandwidth: Max response bytes per second, or None.
+    """
+
+    def __init__(self, delay=0.0, drop=False, bandwidth=None):
+        self.delay = delay
+        self.drop = drop
+        self.bandwidth = bandwidth
+        return
+
+
+class FaultProxy:
+    """
+    Threaded HTTP/HTTPS proxy applying the first matching Route to each request.
+
+    Faults are drawn from a random generator seeded with (seed, route, request ordinal
+    for that route), so the n-th request on a route gets the same fault every run
+    regardless of thread scheduling. inject_xhr_faults() uses the same generator, so a
+    seed gives the same faults in both modes.
+
+    :attribute list routes: Routes, checked in order.
+    :attribute int seed:
+    :attribute str address: 'host:port' to pass to the browser, once started.
+    """
+
+    def __init__(self, routes=None, seed=0, host='127.0.0.1', port=0):
+        self.routes = routes if routes is not None else []
+        self.seed = seed
+        self._host = host
+        self._port = port
+        self._counters = dict()
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        return
+
+    @property
+    def address(self):
+        if self._server is None:
+            return None
+        host, port = self._server.server_address[:2]
+        return f"{host}:{port}"
+
+    def start(self):
+        if self._server is not None:
+            logging.debug('Fault proxy already started. No action needed.')
+            return
+        self._server = _ThreadingProxyServer((self._host, self._port), _ProxyRequestHandler)
+        self._server.fault_proxy = self
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fault-proxy', daemon=True)
+        self._thread.start()
+        logging.info(f"Fault proxy listening on {self.address} (seed {self.seed}).")
+        return
+
+    def stop(self):
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = None
+        self._thread = None
+        logging.info('Fault proxy stopped.')
+        return
+
+    def reset(self):
+        """
+        Resets request ordinals, so the next run replays the same faults.
+        """
+        with self._lock:
+            self._counters.clear()
+        return
+
+    def decide(self, target, is_xhr=False):
+        """
+        :param str target: 'host/path' or 'host:port'.
+        :param bool is_xhr:
+        :returns Fault:
+        """
+        for index, route in enumerate(self.routes):
+            if route.matches(target, is_xhr=is_xhr):
+                break
+        else:
+            return Fault()
+
+        with self._lock:
+            ordinal = self._counters.get(index, 0)
+            self._counters[index] = ordinal + 1
+        rng = _fault_random(f"{self.seed}:{index}:{ordinal}")
+
+        delay = route.latency + (rng() * 2 - 1) * route.jitter
+        if rng() < route.slow_rate:
+            delay += route.slow_latency
+        drop = rng() < route.drop_rate
+        fault = Fault(delay=max(delay, 0.0), drop=drop, bandwidth=route.bandwidth)
+        logging.debug(f"{route} #{ordinal} '{target}': delay {fault.delay:.3f}s, drop {fault.drop}.")
+        return fault
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return
+
+
+def _fault_random(key):
+    """
+    Small seeded generator, ported from random() in _XHR_FAULTS_SCRIPT so the proxy and
+    the browser draw identical faults. (random.Random can't be reproduced in JavaScript.)
+
+    :param str key: 'seed:route index:request ordinal'. ASCII.
+    :returns callable returning floats in [0, 1).
+    """
+    mask = 0xFFFFFFFF
+    h = 1779033703 ^ len(key)
+    for character in key:
+        h = ((h ^ ord(character)) * 3432918353) & mask
+        h = ((h << 13) | (h >> 19)) & mask
+
+    def draw():
+        nonlocal h
+        h = ((h ^ (h >> 16)) * 2246822507) & mask
+        h = ((h ^ (h >> 13)) * 3266489909) & mask
+        h ^= h >> 16
+        return h / 4294967296
+
+    return draw
+
+
+class _ThreadingProxyServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _ProxyRequestHandler(http.server.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    _hop_by_hop_headers = {'connection', 'keep-alive', 'proxy-connection', 'proxy-authorization', 'te', 'trailers',
+                           'transfer-encoding', 'upgrade'}
+
+    def log_message(self, format, *args):
+        logging.debug('Fault proxy: ' + format % args)
+        return
+
+    # HTTPS
+
+    def do_CONNECT(self):
+        fault = self.server.fault_proxy.decide(self.path)
+        time.sleep(fault.delay)
+        if fault.drop:
+            self.send_error(502, 'Dropped by fault proxy')
+            return
+        host, _, port = self.path.rpartition(':')
+        try:
+            upstream = socket.create_connection((host, int(port)), timeout=30)
+        except OSError as e:
+            self.send_error(502, str(e))
+            return
+        self.send_response(200, 'Connection Established')
+        self.end_headers()
+        self._pump(upstream, fault.bandwidth)
+        return
+
+    def _pump(self, upstream, bandwidth):
+        sockets = [self.connection, upstream]
+        try:
+            while True:
+                readable, _, errored = select.select(sockets, [], sockets, 30)
+                if errored or not readable:
+                    return
+                for source in readable:
+                    data = source.recv(65536)
+                    if not data:
+                        return
+                    if source is upstream:
+                        _throttled_send(self.connection.sendall, data, bandwidth)
+                    else:
+                        upstream.sendall(data)
+        except OSError:
+            return
+        finally:
+            upstream.close()
+
+    # HTTP
+
+    def _forward(self):
+        url = urllib.parse.urlsplit(self.path)
+        target = url.netloc + (url.path or '/')
+        is_xhr = self.headers.get('X-Requested-With', '').lower() == 'xmlhttprequest'
+        fault = self.server.fault_proxy.decide(target, is_xhr=is_xhr)
+        time.sleep(fault.delay)
+        if fault.drop:
+            self.send_error(504, 'Dropped by fault proxy')
+            return
+
+        body = None
+        if 'Content-Length' in self.headers:
+            body = self.rfile.read(int(self.headers['Content-Length']))
+        headers = {k: v for k, v in self.headers.items() if k.lower() not in self._hop_by_hop_headers}
+        path = url.path or '/'
+        if url.query:
+            path += '?' + url.query
+
+        connection_class = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+        connection = connection_class(url.netloc, timeout=30)
+        try:
+            connection.request(self.command, path, body=body, headers=headers)
+            response = connection.getresponse()
+            data = response.read()
+        except OSError as e:
+            self.send_error(502, str(e))
+            return
+        finally:
+            connection.close()
+
+        self.send_response(response.status, response.reason)
+        for k, v in response.getheaders():
+            if k.lower() not in self._hop_by_hop_headers and k.lower() != 'content-length':
+                self.send_header(k, v)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        _throttled_send(self.wfile.write, data, fault.bandwidth)
+        return
+
+    do_GET = _forward
+    do_POST = _forward
+    do_PUT = _forward
+    do_PATCH = _forward
+    do_DELETE = _forward
+    do_HEAD = _forward
+    do_OPTIONS = _forward
+
+
+def _throttled_send(send, data, bandwidth, chunk_size=16384):
+    if not bandwidth:
+        send(data)
+        return
+    for start in range(0, len(data), chunk_size):
+        chunk = data[start:start + chunk_size]
+        send(chunk)
+        time.sleep(len(chunk) / bandwidth)
+    return
+
+
+# Browser-side faults
+
+
+_DELAY_LOADER_REMOVAL_SCRIPT = """
+(function (delay) {
+    var visible = new WeakMap();
+    function isShown(el) {
+        var style = getComputedStyle(el);
+        return style.display !== 'none' && style.visibility !== 'hidden';
+    }
+    function hold(el) {
+        visible.set(el, false);
+        el.classList.add('fault-proxy-hold');
+        setTimeout(function () { el.classList.remove('fault-proxy-hold'); }, delay);
+    }
+    new MutationObserver(function () {
+        document.querySelectorAll('div.loader').forEach(function (el) {
+            if (el.classList.contains('fault-proxy-hold')) {
+                return;
+            }
+            var shown = isShown(el);
+            if (visible.get(el) && !shown) {
+                hold(el);
+                return;
+            }
+            visible.set(el, shown);
+        });
+    }).observe(document, {attributes: true, childList: true, subtree: true, attributeFilter: ['style', 'class']});
+    document.addEventListener('DOMContentLoaded', function () {
+        var style = document.createElement('style');
+        style.textContent = 'div.loader.fault-proxy-hold {display: block !important; visibility: visible !important;}';
+        document.head.appendChild(style);
+    });
+})(%d);
+"""
+
+
+def delay_loader_removal(driver, delay):
+    """
+    Keeps div.loader visible for an extra delay each time the page hides it.
+
+    The loader is toggled by page JavaScript, which the proxy can't rewrite over
+    HTTPS, so this is injected through the Chrome DevTools Protocol instead.
+    Applies to documents loaded after the call.
+
+    :param WebDriver driver: Chromium-based driver.
+    :param number delay: Extra seconds the loader stays visible.
+    :returns None:
+    """
+    logging.info(f"Delaying 'div.loader' removal by {delay}s.")
+    driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument',
+                           {'source': _DELAY_LOADER_REMOVAL_SCRIPT % int(delay * 1000)})
+    return
+
+
+# Wraps XMLHttpRequest and fetch so requests whose full URL matches a route are delayed or
+#   dropped (failed as a network error). Faults are drawn per (seed, route, request ordinal)
+#   with the same generator as FaultProxy.decide() (see _fault_random), so each run of a
+#   document replays the same faults, and a seed gives the same faults as the proxy.
+_XHR_FAULTS_SCRIPT = """
+(function (routes, seed) {
+    var counters = {};
+    function random(key) {
+        var h = 1779033703 ^ key.length;
+        for (var i = 0; i < key.length; i++) {
+            h = Math.imul(h ^ key.charCodeAt(i), 3432918353);
+            h = (h << 13) | (h >>> 19);
+        }
+        return function () {
+            h = Math.imul(h ^ (h >>> 16), 2246822507);
+            h = Math.imul(h ^ (h >>> 13), 3266489909);
+            h ^= h >>> 16;
+            return (h >>> 0) / 4294967296;
+        };
+    }
+    function decide(url) {
+        for (var index = 0; index < routes.length; index++) {
+            var route = routes[index];
+            if (!new RegExp(route.pattern).test(url)) {
+                continue;
+            }
+            var ordinal = counters[index] || 0;
+            counters[index] = ordinal + 1;
+            var rng = random(seed + ':' + index + ':' + ordinal);
+            var delay = route.latency + (rng() * 2 - 1) * route.jitter;
+            if (rng() < route.slow_rate) {
+                delay += route.slow_latency;
+            }
+            return {delay: Math.max(delay, 0) * 1000, drop: rng() < route.drop_rate};
+        }
+        return null;
+    }
+    var open = XMLHttpRequest.prototype.open;
+    var send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.open = function (method, url) {
+        this.__faultUrl = new URL(url, location.href).href;
+        return open.apply(this, arguments);
+    };
+    XMLHttpRequest.prototype.send = function () {
+        var fault = decide(this.__faultUrl);
+        if (fault === null) {
+            return send.apply(this, arguments);
+        }
+        var xhr = this, args = arguments;
+        setTimeout(function () {
+            if (!fault.drop) {
+                send.apply(xhr, args);
+                return;
+            }
+            // Fail like a network error without sending, so the request (and its headers) is untouched.
+            Object.defineProperty(xhr, 'readyState', {value: 4, configurable: true});
+            ['readystatechange', 'error', 'loadend'].forEach(function (type) {
+                xhr.dispatchEvent(new ProgressEvent(type));
+            });
+        }, fault.delay);
+    };
+    var originalFetch = window.fetch;
+    if (originalFetch !== undefined) {
+        window.fetch = function (input, init) {
+            var url = new URL(typeof input === 'string' ? input : input.url, location.href).href;
+            var fault = decide(url);
+            if (fault === null) {
+                return originalFetch.apply(this, arguments);
+            }
+            var self = this, args = arguments;
+            return new Promise(function (resolve, reject) {
+                setTimeout(function () {
+                    if (fault.drop) {
+                        reject(new TypeError('Failed to fetch (dropped by fault injection)'));
+                        return;
+                    }
+                    originalFetch.apply(self, args).then(resolve, reject);
+                }, fault.delay);
+            });
+        };
+    }
+})(%s, %s);
+"""
+
+
+def inject_xhr_faults(driver, routes, seed=0):
+    """
+    Delays or drops XHR/fetch requests per URL, inside the browser.
+
+    The proxy can only see host:port of HTTPS traffic, so route patterns on paths never
+    match there. This applies the routes' latency, jitter, slow_rate/slow_latency and
+    drop_rate to each XHR/fetch whose full URL matches (JavaScript regex syntax), via the
+    Chrome DevTools Protocol, like delay_loader_removal(). Bandwidth is not applied.
+    Applies to documents loaded after the call.
+
+    :param WebDriver driver: Chromium-based driver.
+    :param list routes: list of Route.
+    :param int seed:
+    :returns None:
+    """
+    route_dicts = [{'pattern': i.pattern, 'latency': i.latency, 'jitter': i.jitter, 'slow_rate': i.slow_rate,
+                    'slow_latency': i.slow_latency, 'drop_rate': i.drop_rate} for i in routes]
+    logging.info(f"Injecting XHR/fetch faults for {', '.join(str(i) for i in routes)} (seed {seed}).")
+    driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument',
+                           {'source': _XHR_FAULTS_SCRIPT % (json.dumps(route_dicts), json.dumps(str(seed)))})
+    return
+
+
+def load_routes(filename):
+    """
+    :param str filename: JSON file containing a list of Route keyword dicts.
+    :returns list of Route:
+    """
+    with open(filename) as f:
+        return [Route.from_dict(i) for i in json.load(f)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Latency and fault injection proxy.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8899)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--routes', help='JSON file containing a list of routes.')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    routes = load_routes(args.routes) if args.routes else []
+    proxy = FaultProxy(routes=routes, seed=args.seed, host=args.host, port=args.port)
+    proxy.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        proxy.stop()
+    return
+
+
+if __name__ == '__main__':
+    main()
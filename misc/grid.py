@@ -0,0 +1,430 @@
+"""
+Local stand-in for a Selenium grid: several chromedriver processes ("nodes") on
+different ports, with a dispatcher that routes each new browser session to the
+least-loaded healthy node.
+
+Each node has a fixed number of slots (concurrent sessions). When every slot is
+taken, new sessions queue until one frees up. A background thread polls every
+node's /status endpoint; a node that fails several checks in a row is marked
+unhealthy and gets no new sessions, and is restarted once its running sessions
+have ended. A session whose creation fails on a node that turns out to be
+unhealthy is requeued onto another node. Sessions already running on a node
+that fails are not moved.
+
+Each session holds a slot until it ends, so the test suite only spreads over
+the nodes with a browser per test (conftest.py's --grid-nodes implies
+--new-browser-per-test).
+
+Everything runs on one machine with no network access, since the nodes are
+plain local chromedriver processes.
+
+Usage:
+    grid = Grid.local(nodes=3, slots=2)
+    grid.start()
+    driver = grid.start_session(lambda url: webdriver.Remote(command_executor=url, options=options))
+    ...
+    grid.end_session(driver)
+    print(grid.metrics())
+    grid.stop()
+
+Or from the command line, to start nodes and watch their health and load:
+    python -m misc.grid --nodes 3 --slots 2
+"""
+
+import argparse
+import json
+import logging
+import socket
+import statistics
+import subprocess
+import threading
+import time
+import urllib.request
+
+
+class GridError(Exception):
+    """
+    No session could be started on any node.
+    """
+
+
+def free_port(host='127.0.0.1'):
+    """
+    :returns int: A port nothing is listening on right now.
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind((host, 0))
+        return s.getsockname()[1]
+
+
+class Node:
+    """
+    One chromedriver process.
+
+    :attribute str url: WebDriver endpoint, for webdriver.Remote(command_executor=...).
+    :attribute int slots: Max concurrent sessions.
+    :attribute int active: Sessions currently routed here.
+    :attribute bool healthy: Whether the node takes new sessions.
+    :attribute int failures: Number of times the node was marked unhealthy.
+    :attribute int consecutive_failures: Failed health checks since the last passing one.
+    """
+
+    def __init__(self, port=None, slots=1, executable='chromedriver', host='127.0.0.1'):
+        self.host = host
+        self.port = port if port is not None else free_port(host)
+        self.slots = slots
+        self.executable = executable
+        self.active = 0
+        self.healthy = False
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.busy_slot_seconds = 0.0
+        self._process = None
+        self._last_change = time.perf_counter()
+        return
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def load(self):
+        return self.active / self.slots
+
+    @property
+    def has_free_slot(self):
+        return self.healthy and self.active < self.slots
+
+    def __str__(self):
+        return f"node {self.url}"
+
+    # Process
+
+    def start(self, time_limit=10.0):
+        logging.info(f"Starting {self}.")
+        self._process = subprocess.Popen([self.executable, f"--port={self.port}"],
+                                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        end_time = time.perf_counter() + time_limit
+        while time.perf_counter() < end_time:
+            if self.check_health():
+                self.healthy = True
+                self.consecutive_failures = 0
+                return
+            time.sleep(0.1)
+
+        log_str = f"{self} did not become ready within {time_limit} seconds."
+        logging.error(log_str)
+        # Otherwise every failed restart leaks a chromedriver process.
+        self.stop()
+        raise GridError(log_str)
+
+    def stop(self):
+        if self._process is None:
+            return
+        logging.info(f"Stopping {self}.")
+        self._process.terminate()
+        try:
+            self._process.wait(timeout=5.0)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            self._process.wait()
+        self._process = None
+        self.healthy = False
+        return
+
+    def restart(self, time_limit=10.0):
+        self.stop()
+        self.start(time_limit=time_limit)
+        return
+
+    def check_health(self, timeout=2.0):
+        """
+        :returns bool: Whether the process is running and /status reports it ready.
+            Doesn't change healthy; see Grid.check_nodes().
+        """
+        if self._process is None or self._process.poll() is not None:
+            return False
+        try:
+            with urllib.request.urlopen(f"{self.url}/status", timeout=timeout) as response:
+                return bool(json.load(response).get('value', dict()).get('ready', False))
+        except (OSError, ValueError):
+            return False
+
+    # Accounting (callers hold the grid's lock)
+
+    def _change_active(self, delta):
+        now = time.perf_counter()
+        self.busy_slot_seconds += self.active * (now - self._last_change)
+        self._last_change = now
+        self.active += delta
+        return
+
+
+class Grid:
+    """
+    Dispatches sessions across nodes. Thread-safe.
+
+    :attribute list nodes: list of Node.
+    :attribute number health_interval: Seconds between health checks.
+    :attribute int max_attempts: Nodes tried per session before giving up.
+    :attribute int failure_threshold: Consecutive failed health checks before a node is marked unhealthy.
+    :attribute list queue_waits: Seconds each session waited for a free slot.
+    :attribute int requeued: Sessions moved to another node after a node failure.
+    """
+
+    def __init__(self, nodes, health_interval=5.0, max_attempts=3, failure_threshold=3):
+        self.nodes = nodes
+        self.health_interval = health_interval
+        self.max_attempts = max_attempts
+        self.failure_threshold = failure_threshold
+        self.queue_waits = []
+        self.requeued = 0
+        self._sessions = dict()
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._health_thread = None
+        self._start_time = None
+        return
+
+    @classmethod
+    def local(cls, nodes=2, slots=1, executable='chromedriver', **kwargs):
+        """
+        :param int nodes: Number of chromedriver processes, each on a free port.
+        :param int slots: Sessions per node.
+        :returns Grid:
+        """
+        return cls([Node(slots=slots, executable=executable) for _ in range(nodes)], **kwargs)
+
+    def start(self):
+        for node in self.nodes:
+            node.start()
+        self._start_time = time.perf_counter()
+        self._stop.clear()
+        self._health_thread = threading.Thread(target=self._monitor_health, name='grid-health', daemon=True)
+        self._health_thread.start()
+        return
+
+    def stop(self):
+        self._stop.set()
+        if self._health_thread is not None:
+            self._health_thread.join()
+            self._health_thread = None
+        for node in self.nodes:
+            node.stop()
+        return
+
+    # Dispatch
+
+    def acquire(self, timeout=None):
+        """
+        Waits for a free slot, then takes it on the least-loaded healthy node.
+
+        :param number timeout: Max seconds to wait. (Or None to wait indefinitely.)
+        :returns Node:
+        :raises GridError if no slot freed up in time.
+        """
+        queued_time = time.perf_counter()
+        with self._condition:
+            node = None
+            while node is None:
+                candidates = [i for i in self.nodes if i.has_free_slot]
+                if len(candidates) > 0:
+                    node = min(candidates, key=lambda i: (i.load, i.active))
+                    break
+                remaining = None if timeout is None else queued_time + timeout - time.perf_counter()
+                if remaining is not None and remaining <= 0:
+                    log_str = f"No free grid slot within {timeout} seconds."
+                    logging.error(log_str)
+                    raise GridError(log_str)
+                self._condition.wait(remaining)
+            node._change_active(1)
+            self.queue_waits.append(time.perf_counter() - queued_time)
+        logging.debug(f"Routed session to {node} ({node.active}/{node.slots} slots used).")
+        return node
+
+    def release(self, node):
+        with self._condition:
+            node._change_active(-1)
+            self._condition.notify()
+        return
+
+    def start_session(self, factory, timeout=None):
+        """
+        Starts a session on the least-loaded node. If that fails and the node is found
+        unhealthy, the session is requeued onto another node.
+
+        :param factory: Callable taking a node URL and returning a driver, e.g.
+            lambda url: webdriver.Remote(command_executor=url, options=options).
+        :param number timeout: See acquire().
+        :returns the driver.
+        :raises GridError if max_attempts nodes failed.
+        """
+        for attempt in range(self.max_attempts):
+            node = self.acquire(timeout=timeout)
+            try:
+                driver = factory(node.url)
+            except Exception as e:
+                self.release(node)
+                if node.check_health():
+                    raise
+                logging.warning(f"Session failed on unhealthy {node}; requeueing. ({e})")
+                self._mark_failed(node)
+                self.requeued += 1
+                continue
+            with self._condition:
+                self._sessions[id(driver)] = node
+            return driver
+
+        log_str = f"Could not start a session after {self.max_attempts} attempts."
+        logging.error(log_str)
+        raise GridError(log_str)
+
+    def end_session(self, driver):
+        """
+        Quits the driver and frees its slot.
+        """
+        with self._condition:
+            node = self._sessions.pop(id(driver))
+        try:
+            driver.quit()
+        finally:
+            self.release(node)
+        return
+
+    # Health
+
+    def check_nodes(self):
+        """
+        Health-checks every node once. A node is marked unhealthy after failure_threshold
+        failed checks in a row (a busy chromedriver can miss one), and restarted only
+        when it is unhealthy and has no active sessions, since restarting kills them.
+        """
+        for node in self.nodes:
+            ready = node.check_health()
+            with self._condition:
+                if ready:
+                    node.consecutive_failures = 0
+                    if not node.healthy:
+                        logging.info(f"{node} is healthy again.")
+                        node.healthy = True
+                        self._condition.notify_all()
+                    continue
+                node.consecutive_failures += 1
+                if node.healthy and node.consecutive_failures >= self.failure_threshold:
+                    logging.warning(f"{node} failed {node.consecutive_failures} health checks in a row.")
+                    node.healthy = False
+                    node.failures += 1
+                restart = not node.healthy and node.active == 0
+            if not restart:
+                continue
+            try:
+                node.restart()
+            except GridError:
+                continue
+            with self._condition:
+                self._condition.notify_all()
+        return
+
+    def _mark_failed(self, node):
+        with self._condition:
+            node.healthy = False
+            node.failures += 1
+            node.consecutive_failures = max(node.consecutive_failures, self.failure_threshold)
+        return
+
+    def _monitor_health(self):
+        while not self._stop.wait(self.health_interval):
+            self.check_nodes()
+        return
+
+    # Metrics
+
+    def metrics(self):
+        """
+        :returns dict: 'sessions', 'requeued', 'queue_wait' ('mean', 'max' and 'p95' seconds),
+            and 'nodes' (url -> 'utilization', the fraction of slot time in use since start(),
+            plus 'active', 'slots', 'healthy' and 'failures').
+        """
+        with self._condition:
+            waits = sorted(self.queue_waits)
+            elapsed = time.perf_counter() - self._start_time if self._start_time is not None else 0.0
+            nodes = dict()
+            for node in self.nodes:
+                node._change_active(0)
+                utilization = node.busy_slot_seconds / (node.slots * elapsed) if elapsed > 0 else 0.0
+                nodes[node.url] = {
+                    'utilization': utilization,
+                    'active': node.active,
+                    'slots': node.slots,
+                    'healthy': node.healthy,
+                    'failures': node.failures,
+                }
+        queue_wait = {'mean': 0.0, 'max': 0.0, 'p95': 0.0}
+        if len(waits) > 0:
+            queue_wait = {
+                'mean': statistics.mean(waits),
+                'max': waits[-1],
+                'p95': waits[min(len(waits) - 1, int(0.95 * len(waits)))],
+            }
+        return {'sessions': len(waits), 'requeued': self.requeued, 'queue_wait': queue_wait, 'nodes': nodes}
+
+
+# Pytest Plugin
+
+
+class GridPlugin:
+    """
+    Registered by conftest.py when --grid-nodes is given. Owns the grid for the session
+    and reports its metrics at the end.
+    """
+
+    def __init__(self, grid):
+        self.grid = grid
+        return
+
+    def pytest_sessionstart(self, session):
+        self.grid.start()
+        return
+
+    def pytest_sessionfinish(self, session):
+        self.grid.stop()
+        return
+
+    def pytest_terminal_summary(self, terminalreporter):
+        metrics = self.grid.metrics()
+        terminalreporter.write_sep('-', 'grid')
+        queue_wait = metrics['queue_wait']
+        terminalreporter.write_line(f"{metrics['sessions']} sessions, {metrics['requeued']} requeued. Queue wait: "
+                                    f"mean {queue_wait['mean']:.2f}s, p95 {queue_wait['p95']:.2f}s, "
+                                    f"max {queue_wait['max']:.2f}s.")
+        for url, node in metrics['nodes'].items():
+            terminalreporter.write_line(f"{url}: utilization {node['utilization']:.0%}, "
+                                        f"{node['failures']} failures.")
+        return
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local multi-node chromedriver grid.')
+    parser.add_argument('--nodes', type=int, default=2)
+    parser.add_argument('--slots', type=int, default=1, help='Sessions per node.')
+    parser.add_argument('--chromedriver', default='chromedriver')
+    parser.add_argument('--health-interval', type=float, default=5.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    grid = Grid.local(nodes=args.nodes, slots=args.slots, executable=args.chromedriver,
+                      health_interval=args.health_interval)
+    grid.start()
+    try:
+        while True:
+            time.sleep(args.health_interval)
+            print(json.dumps(grid.metrics()['nodes'], indent=1))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        grid.stop()
+    return
+
+
+if __name__ == '__main__':
+    main()
@@ -57,14 +57,23 @@ config = {
     },
 }
 
-for key in config['handlers']:
-    # Skip console handler.
-    if 'filename' in config['handlers'][key].keys():
-        filename = config['handlers'][key]['filename']
-        dirname = os.path.dirname(filename)
-        # Create log directory if it doesn't exist.
-        if not os.path.exists(dirname):
-            os.makedirs(dirname)
-        # Delete log file if it exists (a new one will be created).
-        if os.path.isfile(filename):
-            os.remove(filename)
+
+def prepare_log_files(config=config):
+    """
+    Creates log directories and deletes old log files (new ones will be created).
+
+    Not done at import, so importing this module has no side effects; call it once,
+    right before logging.config.dictConfig(config).
+    """
+    for key in config['handlers']:
+        # Skip console handler.
+        if 'filename' in config['handlers'][key].keys():
+            filename = config['handlers'][key]['filename']
+            dirname = os.path.dirname(filename)
+            # Create log directory if it doesn't exist.
+            if not os.path.exists(dirname):
+                os.makedirs(dirname)
+            # Delete log file if it exists (a new one will be created).
+            if os.path.isfile(filename):
+                os.remove(filename)
+    return
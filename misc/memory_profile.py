@@ -0,0 +1,249 @@
+"""
+Opt-in memory instrumentation around every step in steps/.
+
+For each step call, records:
+* Python heap growth, from tracemalloc snapshots taken before and after, plus
+  the allocation sites which grew the most.
+* Browser JS heap growth, from performance.memory (Chrome), falling back to the
+  DevTools Protocol's Performance.getMetrics.
+* Growth in the number of live page objects (BaseDesc) and WebElements. Counting
+  them means a full garbage collection and heap scan, so this is only done
+  around outermost steps; steps called from other steps are counted in their caller.
+
+A step is flagged as leaking when its Python or JS heap grows on every one of
+its last few calls and the total growth over those calls passes a threshold.
+
+Enable with pytest's --memory-profile REPORT.json (see conftest.py).
+"""
+
+import contextlib
+import gc
+import json
+import logging
+import os
+import tracemalloc
+
+from misc import step_hooks
+
+
+_JS_HEAP_SCRIPT = """
+return window.performance && performance.memory ? performance.memory.usedJSHeapSize : null;
+"""
+
+
+class StepMemorySample:
+    """
+    Memory growth over one step call.
+
+    :attribute str test: Node ID of the test which ran the step.
+    :attribute str step: Step name.
+    :attribute int python_growth: Bytes.
+    :attribute int js_heap_growth: Bytes, or None if the browser doesn't expose it.
+    :attribute int page_object_growth: Live BaseDesc instances, or None for a nested step.
+    :attribute int web_element_growth: Live WebElement instances, or None for a nested step.
+    :attribute list top_allocations: list of str, the allocation sites which grew the most.
+    """
+
+    def __init__(self, test, step, python_growth, js_heap_growth, page_object_growth, web_element_growth,
+                 top_allocations):
+        self.test = test
+        self.step = step
+        self.python_growth = python_growth
+        self.js_heap_growth = js_heap_growth
+        self.page_object_growth = page_object_growth
+        self.web_element_growth = web_element_growth
+        self.top_allocations = top_allocations
+        return
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+class MemoryProfiler:
+    """
+    Step hook (see misc.step_hooks) recording a StepMemorySample per step call.
+
+    :attribute list samples: list of StepMemorySample.
+    :attribute int leak_window: Consecutive growing calls needed to flag a step.
+    :attribute int leak_threshold: Minimum total bytes grown over those calls.
+    :attribute int top_allocations: Number of allocation sites kept per sample.
+    :attribute tuple wrapper_classes: (page object class, WebElement class) to count.
+        Defaults to (BaseDesc, WebElement), imported on first use.
+    """
+
+    def __init__(self, leak_window=3, leak_threshold=1024 * 1024, top_allocations=5, wrapper_classes=None):
+        self.samples = []
+        self.leak_window = leak_window
+        self.leak_threshold = leak_threshold
+        self.top_allocations = top_allocations
+        self.wrapper_classes = wrapper_classes
+        self._started_tracemalloc = False
+        self._depth = 0
+        return
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        return
+
+    def stop(self):
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        return
+
+    @contextlib.contextmanager
+    def __call__(self, step_name, driver):
+        outermost = self._depth == 0
+        before = self._measure(driver, count_wrappers=outermost)
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            after = self._measure(driver, count_wrappers=outermost)
+            growth = after['snapshot'].compare_to(before['snapshot'], 'lineno')
+            js_heap_growth = None
+            if before['js_heap'] is not None and after['js_heap'] is not None:
+                js_heap_growth = after['js_heap'] - before['js_heap']
+            sample = StepMemorySample(
+                test=step_hooks.current_test(),
+                step=step_name,
+                python_growth=sum(i.size_diff for i in growth),
+                js_heap_growth=js_heap_growth,
+                page_object_growth=_difference(after['page_objects'], before['page_objects']),
+                web_element_growth=_difference(after['web_elements'], before['web_elements']),
+                top_allocations=[str(i) for i in growth[:self.top_allocations] if i.size_diff > 0],
+            )
+            self.samples.append(sample)
+            logging.debug(f"Memory: {step_name} grew Python heap by {sample.python_growth} bytes, "
+                          f"JS heap by {sample.js_heap_growth} bytes.")
+
+    def _measure(self, driver, count_wrappers):
+        page_objects_count, web_elements_count = None, None
+        if count_wrappers:
+            gc.collect()
+            page_objects_count, web_elements_count = _count_wrappers(self._wrapper_classes())
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ])
+        return {
+            'snapshot': snapshot,
+            'js_heap': _js_heap_size(driver),
+            'page_objects': page_objects_count,
+            'web_elements': web_elements_count,
+        }
+
+    def _wrapper_classes(self):
+        if self.wrapper_classes is None:
+            from selenium.webdriver.remote.webelement import WebElement
+
+            from page_objects.base import BaseDesc
+            self.wrapper_classes = (BaseDesc, WebElement)
+        return self.wrapper_classes
+
+    # Reporting
+
+    def leaks(self):
+        """
+        :returns list of dict: step, kind ('python' or 'js_heap') and total growth, per flagged step.
+        """
+        by_step = dict()
+        for sample in self.samples:
+            by_step.setdefault(sample.step, []).append(sample)
+        flagged = []
+        for step, samples in by_step.items():
+            recent = samples[-self.leak_window:]
+            if len(recent) < self.leak_window:
+                continue
+            for kind, attribute in (('python', 'python_growth'), ('js_heap', 'js_heap_growth')):
+                values = [getattr(i, attribute) for i in recent]
+                if None in values:
+                    continue
+                if all(i > 0 for i in values) and sum(values) >= self.leak_threshold:
+                    flagged.append({'step': step, 'kind': kind, 'growth': sum(values)})
+        return flagged
+
+    def write_report(self, filename):
+        dirname = os.path.dirname(filename)
+        if dirname != '' and not os.path.exists(dirname):
+            os.makedirs(dirname)
+        leaks = self.leaks()
+        with open(filename, 'w') as f:
+            json.dump({'samples': [i.to_dict() for i in self.samples], 'leaks': leaks}, f, indent=1)
+        for leak in leaks:
+            logging.warning(f"Possible {leak['kind']} leak in {leak['step']}: grew {leak['growth']} bytes "
+                            f"over its last {self.leak_window} calls.")
+        return
+
+
+def _js_heap_size(driver):
+    if driver is None:
+        return None
+    try:
+        size = driver.execute_script(_JS_HEAP_SCRIPT)
+        if size is not None:
+            return size
+        metrics = driver.execute_cdp_cmd('Performance.getMetrics', dict())['metrics']
+        return next((int(i['value']) for i in metrics if i['name'] == 'JSHeapUsedSize'), None)
+    except Exception as e:
+        # Closed/non-Chromium drivers just don't get JS heap numbers.
+        logging.debug(f"JS heap size unavailable: {e}")
+        return None
+
+
+def _count_wrappers(classes):
+    """
+    :param tuple classes: (page object class, WebElement class).
+    :returns tuple of (page objects, WebElements) alive.
+    """
+    page_object_class, web_element_class = classes
+    page_objects_count = 0
+    web_elements_count = 0
+    for i in gc.get_objects():
+        if isinstance(i, page_object_class):
+            page_objects_count += 1
+        elif isinstance(i, web_element_class):
+            web_elements_count += 1
+    return page_objects_count, web_elements_count
+
+
+def _difference(after, before):
+    if after is None or before is None:
+        return None
+    return after - before
+
+
+# Pytest Plugin
+
+
+class MemoryProfilePlugin:
+    """
+    Registered by conftest.py when --memory-profile is given.
+    """
+
+    def __init__(self, report_filename, profiler=None):
+        self.report_filename = report_filename
+        self.profiler = profiler if profiler is not None else MemoryProfiler()
+        return
+
+    def pytest_sessionstart(self, session):
+        self.profiler.start()
+        step_hooks.add_hook(self.profiler)
+        return
+
+    def pytest_sessionfinish(self, session):
+        step_hooks.remove_hook(self.profiler)
+        self.profiler.stop()
+        self.profiler.write_report(self.report_filename)
+        return
+
+    def pytest_terminal_summary(self, terminalreporter):
+        terminalreporter.write_sep('-', 'memory profile')
+        terminalreporter.write_line(f"{len(self.profiler.samples)} step calls profiled; "
+                                    f"report written to {self.report_filename}.")
+        for leak in self.profiler.leaks():
+            terminalreporter.write_line(f"Possible {leak['kind']} leak in {leak['step']}: {leak['growth']} bytes.")
+        return
@@ -0,0 +1,247 @@
+"""
+Expected-results oracle, backed by a local SQLite index of the Pokedex dataset.
+
+The dataset is harvested (see steps.pokedex.build_oracle) and indexed by
+lowercase name, number and every substring of both, so "expected results for
+query q under sort s" is an indexed lookup, then memoized in process. The
+index stores the fingerprint of the dataset it was built from; rebuilding with
+a dataset whose fingerprint differs replaces it.
+
+Harvesting the dataset means loading every result, so the index also stores a
+probe: a fingerprint of the first and last few entries and the result count,
+which the page shows without loading more, plus the time of the last harvest.
+The harvest is skipped while the probe matches and the index is younger than
+a maximum age (see is_current). Changes that touch neither end of the dataset
+are caught by the next full harvest, at the latest once the index is too old.
+
+Search semantics match steps.pokedex.verify_search_field_results: a result
+matches if the lowercase query is in its lowercase name or its number text.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+
+from misc.result_snapshot import parse_number
+
+
+_ORDER_BY = {
+    'lowest number (first)': 'number ASC, position ASC',
+    'highest number (first)': 'number DESC, position ASC',
+    'a-z': 'name ASC, position ASC',
+    'z-a': 'name DESC, position ASC',
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS pokemon (
+    position INTEGER PRIMARY KEY,
+    number INTEGER NOT NULL,
+    number_text TEXT NOT NULL,
+    name TEXT NOT NULL,
+    name_lower TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pokemon_number ON pokemon (number);
+CREATE INDEX IF NOT EXISTS pokemon_name_lower ON pokemon (name_lower);
+CREATE TABLE IF NOT EXISTS substrings (
+    substring TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (substring, position)
+) WITHOUT ROWID;
+"""
+
+
+def dataset_fingerprint(entries):
+    """
+    Order-independent digest of a dataset.
+
+    :param list entries: list of (number text, name) tuples.
+    :returns str:
+    """
+    digest = hashlib.sha256()
+    for number_text, name in sorted(entries):
+        digest.update(f"{number_text}\t{name}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def probe_fingerprint(first_entries, last_entries, count=None):
+    """
+    Cheap, order-dependent digest of the ends of a dataset.
+
+    :param list first_entries: (number text, name) tuples at the start, lowest number first.
+    :param list last_entries: (number text, name) tuples at the end, highest number first.
+    :param int count: Number of results the page shows, if known.
+    :returns str:
+    """
+    digest = hashlib.sha256(f"{count}\n".encode('utf-8'))
+    for label, entries in (('first', first_entries), ('last', last_entries)):
+        for number_text, name in entries:
+            digest.update(f"{label}\t{number_text}\t{name}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _substrings(text):
+    return {text[start:end] for start in range(len(text)) for end in range(start + 1, len(text) + 1)}
+
+
+class StaleOracleError(Exception):
+    """
+    The oracle has no dataset to answer from.
+    """
+
+
+class OracleStore:
+    """
+    :attribute str filename: SQLite database file.
+    :attribute str fingerprint: Fingerprint of the indexed dataset. (Or None if empty.)
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        dirname = os.path.dirname(filename)
+        if dirname != '':
+            os.makedirs(dirname, exist_ok=True)
+        self._connection = sqlite3.connect(filename)
+        self._connection.executescript(_SCHEMA)
+        self._cache = dict()
+        return
+
+    @property
+    def fingerprint(self):
+        return self._meta('fingerprint')
+
+    @property
+    def probe(self):
+        """
+        :returns str: probe_fingerprint() of the indexed dataset. (Or None.)
+        """
+        return self._meta('probe')
+
+    @property
+    def harvested_at(self):
+        """
+        :returns float: time.time() of the last rebuild() call, i.e. the last full harvest. (Or None.)
+        """
+        value = self._meta('harvested_at')
+        return None if value is None else float(value)
+
+    def is_current(self, probe, max_age=None):
+        """
+        :param str probe: probe_fingerprint() of the live dataset.
+        :param number max_age: Seconds after a harvest before the next full harvest is due. (Or None for never.)
+        :returns bool: Whether the index can be used without harvesting the dataset again.
+        """
+        if len(self) == 0 or self.probe != probe:
+            return False
+        if max_age is not None and (self.harvested_at is None or time.time() - self.harvested_at > max_age):
+            return False
+        return True
+
+    def _meta(self, key):
+        row = self._connection.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def __len__(self):
+        return self._connection.execute('SELECT COUNT(*) FROM pokemon').fetchone()[0]
+
+    # Building
+
+    def rebuild(self, entries, probe=None):
+        """
+        Replaces the index with entries, unless it was already built from the same dataset.
+
+        :param list entries: list of (number text, name) tuples, e.g. ('#0025', 'Pikachu').
+        :param str probe: probe_fingerprint() of the same dataset, stored for later cheap checks.
+        :returns bool: True if the index was rebuilt.
+        """
+        fingerprint = dataset_fingerprint(entries)
+        if fingerprint == self.fingerprint:
+            logging.debug(f"Oracle '{self.filename}' is already current; no rebuild needed.")
+            with self._connection:
+                self._set_harvested_at()
+                if probe is not None and probe != self.probe:
+                    self._connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('probe', ?)", (probe,))
+            return False
+
+        logging.info(f"Rebuilding oracle '{self.filename}' with {len(entries)} entries.")
+        with self._connection:
+            self._clear(commit=False)
+            self._connection.executemany(
+                'INSERT INTO pokemon (position, number, number_text, name, name_lower) VALUES (?, ?, ?, ?, ?)',
+                ((position, parse_number(number_text), number_text, name, name.lower())
+                 for position, (number_text, name) in enumerate(entries))
+            )
+            self._connection.executemany(
+                'INSERT OR IGNORE INTO substrings (substring, position) VALUES (?, ?)',
+                ((substring, position)
+                 for position, (number_text, name) in enumerate(entries)
+                 for substring in _substrings(name.lower()) | _substrings(number_text.lower()))
+            )
+            self._connection.execute("INSERT INTO meta (key, value) VALUES ('fingerprint', ?)", (fingerprint,))
+            if probe is not None:
+                self._connection.execute("INSERT INTO meta (key, value) VALUES ('probe', ?)", (probe,))
+            self._set_harvested_at()
+        return True
+
+    def _set_harvested_at(self):
+        self._connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('harvested_at', ?)",
+                                 (str(time.time()),))
+        return
+
+    def _clear(self, commit=True):
+        self._connection.execute('DELETE FROM pokemon')
+        self._connection.execute('DELETE FROM substrings')
+        self._connection.execute("DELETE FROM meta WHERE key IN ('fingerprint', 'probe', 'harvested_at')")
+        if commit:
+            self._connection.commit()
+        self._cache.clear()
+        return
+
+    # Lookups
+
+    def expected_results(self, query, sort_method):
+        """
+        :param str query: Search query; '' matches everything.
+        :param str sort_method: One of the SortDropdown options, case-insensitive.
+        :returns tuple of (number text, name) tuples, in display order.
+        :raises ValueError if sort_method is invalid.
+        :raises StaleOracleError if the oracle is empty.
+        """
+        key = (query.lower(), sort_method.lower())
+        if key in self._cache:
+            return self._cache[key]
+
+        if key[1] not in _ORDER_BY:
+            log_str = f"Invalid sort method '{sort_method}' specified."
+            logging.error(log_str)
+            raise ValueError(log_str)
+        if self.fingerprint is None:
+            log_str = f"Oracle '{self.filename}' has no dataset; rebuild it first."
+            logging.error(log_str)
+            raise StaleOracleError(log_str)
+
+        order_by = _ORDER_BY[key[1]]
+        if key[0] == '':
+            rows = self._connection.execute(f'SELECT number_text, name FROM pokemon ORDER BY {order_by}')
+        else:
+            rows = self._connection.execute(
+                'SELECT number_text, name FROM pokemon WHERE position IN '
+                f'(SELECT position FROM substrings WHERE substring = ?) ORDER BY {order_by}',
+                (key[0],)
+            )
+        result = tuple(rows)
+        self._cache[key] = result
+        return result
+
+    def close(self):
+        self._connection.close()
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return
@@ -0,0 +1,299 @@
+"""
+Compact columnar snapshots of harvested search results, with cross-run diffing.
+
+One file per (query, sort order). Layout, little-endian:
+    header        magic b'PDXS', version (u16), reserved (u16), count (u32), names size (u32)
+    numbers       int32 * count
+    name hashes   uint64 * count, the first 8 bytes of each name's BLAKE2b digest
+    name offsets  uint32 * (count + 1), into the names blob
+    names         UTF-8 blob
+
+Snapshots are written from a stream of entries and read through mmap. A diff
+compares the numbers and name hash columns, and only pages in the few names it
+reports.
+"""
+
+import array
+import bisect
+import hashlib
+import mmap
+import os
+import re
+import shutil
+import struct
+import sys
+import tempfile
+import urllib.parse
+
+
+_HEADER = struct.Struct('<4sHHII')
+_MAGIC = b'PDXS'
+_VERSION = 2
+# Longest quoted query kept in a filename; the hash suffix keeps longer ones distinct.
+_MAX_QUOTED_LENGTH = 80
+
+
+def parse_number(text):
+    """
+    :param str text: e.g. '#0025'
+    :returns int:
+    """
+    digits = re.sub(r'\D', '', text)
+    return int(digits) if digits != '' else -1
+
+
+def snapshot_path(directory, query, sort_method):
+    """
+    :returns str: Filename for a query and sort order, e.g. 'q-pika__s-a-z__<hash>.pdxs'.
+        The readable part is percent-quoted (underscores too) and case is kept; the hash
+        of the exact query and sort keeps names distinct on case-insensitive file systems
+        and when a long query is truncated.
+    """
+    quoted = [urllib.parse.quote(i, safe='').replace('_', '%5F')[:_MAX_QUOTED_LENGTH] for i in (query, sort_method)]
+    digest = hashlib.blake2b(f"{len(query)}:{query}:{sort_method}".encode('utf-8'), digest_size=8).hexdigest()
+    return os.path.join(directory, f"q-{quoted[0]}__s-{quoted[1]}__{digest}.pdxs")
+
+
+def name_hash(name_bytes):
+    """
+    :param bytes name_bytes: UTF-8 name.
+    :returns int: Value stored in the name hashes column.
+    """
+    return int.from_bytes(hashlib.blake2b(name_bytes, digest_size=8).digest(), 'little')
+
+
+def write_snapshot(filename, entries, chunk_size=4096):
+    """
+    Writes entries as they arrive. Columns are spooled to temporary files, so only
+    chunk_size entries are held in memory.
+
+    :param str filename:
+    :param entries: Iterable of (int, str) tuples, i.e. (number, name).
+    :param int chunk_size:
+    :returns int: Number of entries written.
+    """
+    dirname = os.path.dirname(filename)
+    if dirname != '':
+        os.makedirs(dirname, exist_ok=True)
+    count = 0
+    names_size = 0
+    with tempfile.TemporaryFile() as numbers_file, tempfile.TemporaryFile() as hashes_file, \
+            tempfile.TemporaryFile() as offsets_file, tempfile.TemporaryFile() as names_file:
+        columns = _new_columns(first_offset=0)
+        for number, name in entries:
+            encoded = name.encode('utf-8')
+            names_file.write(encoded)
+            names_size += len(encoded)
+            columns[0].append(number)
+            columns[1].append(name_hash(encoded))
+            columns[2].append(names_size)
+            count += 1
+            if len(columns[0]) >= chunk_size:
+                _write_columns(columns, (numbers_file, hashes_file, offsets_file))
+                columns = _new_columns()
+        _write_columns(columns, (numbers_file, hashes_file, offsets_file))
+
+        with open(filename + '.tmp', 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, _VERSION, 0, count, names_size))
+            for column_file in (numbers_file, hashes_file, offsets_file, names_file):
+                column_file.seek(0)
+                shutil.copyfileobj(column_file, f)
+    os.replace(filename + '.tmp', filename)
+    return count
+
+
+def _new_columns(first_offset=None):
+    offsets = array.array('I') if first_offset is None else array.array('I', [first_offset])
+    return array.array('i'), array.array('Q'), offsets
+
+
+def _write_columns(columns, files):
+    for column, f in zip(columns, files):
+        if sys.byteorder != 'little':
+            column.byteswap()
+        f.write(column.tobytes())
+    return
+
+
+class ResultSnapshot:
+    """
+    Memory-mapped, read-only view of a snapshot file.
+
+    :attribute str filename:
+    :attribute memoryview numbers: int32 column.
+    :attribute memoryview name_hashes: uint64 column; see name_hash().
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, count, names_size = _HEADER.unpack_from(self._mmap)
+        if magic != _MAGIC or version != _VERSION:
+            self._mmap.close()
+            raise ValueError(f"'{filename}' is not a version {_VERSION} result snapshot.")
+        self._count = count
+        view = memoryview(self._mmap)
+        start = _HEADER.size
+        self._numbers_bytes = view[start:start + 4 * count]
+        start += 4 * count
+        self._hashes_bytes = view[start:start + 8 * count]
+        start += 8 * count
+        self._offsets_bytes = view[start:start + 4 * (count + 1)]
+        start += 4 * (count + 1)
+        self._names = view[start:start + names_size]
+        if sys.byteorder == 'little':
+            self.numbers = self._numbers_bytes.cast('i')
+            self.name_hashes = self._hashes_bytes.cast('Q')
+            self._offsets = self._offsets_bytes.cast('I')
+        else:
+            self.numbers = array.array('i', self._numbers_bytes)
+            self.numbers.byteswap()
+            self.name_hashes = array.array('Q', self._hashes_bytes)
+            self.name_hashes.byteswap()
+            self._offsets = array.array('I', self._offsets_bytes)
+            self._offsets.byteswap()
+        return
+
+    def __len__(self):
+        return self._count
+
+    def name_bytes(self, index):
+        return self._names[self._offsets[index]:self._offsets[index + 1]]
+
+    def name(self, index):
+        return bytes(self.name_bytes(index)).decode('utf-8')
+
+    def __iter__(self):
+        for index in range(self._count):
+            yield self.numbers[index], self.name(index)
+
+    def close(self):
+        # Views into the mmap must be released before it can close.
+        for view in (self.numbers, self.name_hashes, self._offsets):
+            if isinstance(view, memoryview):
+                view.release()
+        for view in (self._numbers_bytes, self._hashes_bytes, self._offsets_bytes, self._names):
+            view.release()
+        self._mmap.close()
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return
+
+
+class SnapshotDiff:
+    """
+    Differences between two snapshots of the same query and sort order.
+
+    Entries are keyed by Pokedex number (plus occurrence, for repeated numbers). Renames
+    are found by comparing name hashes, so only reported names are read.
+
+    :attribute list insertions: (new position, number, name) for entries only in the new snapshot.
+    :attribute list removals: (old position, number, name) for entries only in the old snapshot.
+    :attribute list moves: (old position, new position, number, name) for entries whose relative
+        order changed; the minimal set, i.e. everything outside the longest unchanged order.
+    :attribute list renames: (new position, number, old name, new name).
+    """
+
+    def __init__(self):
+        self.insertions = []
+        self.removals = []
+        self.moves = []
+        self.renames = []
+        return
+
+    @property
+    def is_empty(self):
+        return not (self.insertions or self.removals or self.moves or self.renames)
+
+    def __str__(self):
+        if self.is_empty:
+            return 'No differences.'
+        lines = []
+        for position, number, name in self.insertions:
+            lines.append(f"+ #{number} {name} (position {position})")
+        for position, number, name in self.removals:
+            lines.append(f"- #{number} {name} (was position {position})")
+        for old_position, new_position, number, name in self.moves:
+            lines.append(f"~ #{number} {name} moved {old_position} -> {new_position}")
+        for position, number, old_name, new_name in self.renames:
+            lines.append(f"* #{number} renamed '{old_name}' -> '{new_name}' (position {position})")
+        return '\n'.join(lines)
+
+
+def _keys(numbers):
+    seen = dict()
+    keys = []
+    for number in numbers:
+        occurrence = seen.get(number, 0)
+        seen[number] = occurrence + 1
+        keys.append((number, occurrence))
+    return keys
+
+
+def _longest_increasing_subsequence(values):
+    """
+    :returns set of indexes into values forming a longest strictly increasing subsequence.
+    """
+    tails = []
+    tail_indexes = []
+    previous = [-1] * len(values)
+    for index, value in enumerate(values):
+        position = bisect.bisect_left(tails, value)
+        if position > 0:
+            previous[index] = tail_indexes[position - 1]
+        if position == len(tails):
+            tails.append(value)
+            tail_indexes.append(index)
+        else:
+            tails[position] = value
+            tail_indexes[position] = index
+    result = set()
+    index = tail_indexes[-1] if tail_indexes else -1
+    while index != -1:
+        result.add(index)
+        index = previous[index]
+    return result
+
+
+def diff_snapshots(old, new):
+    """
+    :param ResultSnapshot old:
+    :param ResultSnapshot new:
+    :returns SnapshotDiff:
+    """
+    result = SnapshotDiff()
+    old_keys = _keys(old.numbers)
+    old_positions = {key: position for position, key in enumerate(old_keys)}
+    new_keys = _keys(new.numbers)
+    new_key_set = set(new_keys)
+
+    for position, key in enumerate(old_keys):
+        if key not in new_key_set:
+            result.removals.append((position, key[0], old.name(position)))
+
+    common = []
+    for new_position, key in enumerate(new_keys):
+        old_position = old_positions.get(key)
+        if old_position is None:
+            result.insertions.append((new_position, key[0], new.name(new_position)))
+            continue
+        common.append((old_position, new_position, key[0]))
+        if old.name_hashes[old_position] != new.name_hashes[new_position]:
+            result.renames.append((new_position, key[0], old.name(old_position), new.name(new_position)))
+
+    in_order = _longest_increasing_subsequence([i[0] for i in common])
+    for index, (old_position, new_position, number) in enumerate(common):
+        if index not in in_order:
+            result.moves.append((old_position, new_position, number, new.name(new_position)))
+    return result
+
+
+def diff_files(old_filename, new_filename):
+    with ResultSnapshot(old_filename) as old, ResultSnapshot(new_filename) as new:
+        return diff_snapshots(old, new)
@@ -0,0 +1,387 @@
+"""
+Duration-aware test scheduling across workers, based on historical timings.
+
+Each pytest process records per-test wall time (setup + call + teardown) and
+per-step time into a local JSON history. When a run is split across N workers
+(--workers N --worker-index i), tests are assigned longest-expected-first to
+the least-loaded worker (LPT), so the slowest worker finishes as early as
+possible. Expected durations are exponentially weighted moving averages, so the
+schedule adapts as history accumulates.
+
+Usage (one process per worker, same run id):
+    pytest tests --workers 3 --worker-index 0 --schedule-run-id nightly-42
+    pytest tests --workers 3 --worker-index 1 --schedule-run-id nightly-42
+    pytest tests --workers 3 --worker-index 2 --schedule-run-id nightly-42
+    python -m misc.scheduler report --run-id nightly-42
+"""
+
+import argparse
+import contextlib
+import heapq
+import json
+import logging
+import os
+import statistics
+import time
+
+import pytest
+
+from misc import step_hooks
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+
+DEFAULT_HISTORY_FILENAME = '.timing_history.json'
+
+
+class TimingHistory:
+    """
+    JSON store of expected test/step durations and per-run schedules.
+
+    Every update is a locked read-modify-write, so concurrent workers can share a file.
+
+    :attribute str filename:
+    :attribute number smoothing: Weight of the newest sample in the moving average.
+    :attribute number default_duration: Expected seconds for a test with no history
+        and no other known tests to estimate from.
+    :attribute int max_runs: Runs whose schedules are kept; older ones are pruned on save.
+    """
+
+    def __init__(self, filename=DEFAULT_HISTORY_FILENAME, smoothing=0.3, default_duration=60.0, max_runs=50):
+        self.filename = filename
+        self.smoothing = smoothing
+        self.default_duration = default_duration
+        self.max_runs = max_runs
+        self._data = self._read()
+        return
+
+    # Reading
+
+    def expected_test_duration(self, test_id):
+        """
+        :returns number: Expected seconds. Unknown tests get the median of known tests.
+        """
+        tests = self._data['tests']
+        if test_id in tests:
+            return tests[test_id]['mean']
+        if len(tests) > 0:
+            return statistics.median(i['mean'] for i in tests.values())
+        return self.default_duration
+
+    def test_ids(self):
+        return sorted(self._data['tests'])
+
+    def expected_step_duration(self, step_name):
+        """
+        :returns number: Expected seconds. (Or None.)
+        """
+        step = self._data['steps'].get(step_name)
+        return None if step is None else step['mean']
+
+    def run(self, run_id):
+        """
+        :returns dict: 'assignment' (list of lists of test ids) and 'workers'
+            (worker index -> {'predicted': seconds, 'actual': seconds}).
+        """
+        return self._data['runs'].get(run_id)
+
+    # Writing
+
+    def record(self, test_durations=None, step_durations=None):
+        """
+        :param dict test_durations: test id -> list of seconds.
+        :param dict step_durations: step name -> list of seconds.
+        """
+        with self._update() as data:
+            for key, durations in (('tests', test_durations), ('steps', step_durations)):
+                for name, samples in (durations or dict()).items():
+                    for sample in samples:
+                        self._add_sample(data[key], name, sample)
+        return
+
+    def assignment_for_run(self, run_id, test_ids, workers, compute):
+        """
+        Returns the assignment stored for run_id, computing and storing it with
+        compute() if this is the first worker to ask. This keeps every worker of
+        a run on the same schedule even though history changes as they finish.
+
+        Collected tests missing from a stored assignment (new tests, a different -k)
+        are placed onto it longest-first and stored, so every worker sees them placed
+        the same way.
+
+        :param str run_id:
+        :param list test_ids: Collected test ids.
+        :param int workers:
+        :param callable compute: Returns list of lists of test ids.
+        :returns list of lists of test ids:
+        :raises pytest.UsageError if the stored assignment is for a different number of workers.
+        """
+        with self._update() as data:
+            run = data['runs'].setdefault(run_id, {'assignment': None, 'workers': dict(), 'created': time.time()})
+            if run['assignment'] is None:
+                run['assignment'] = compute()
+                return run['assignment']
+
+            if len(run['assignment']) != workers:
+                log_str = f"Run '{run_id}' was scheduled for {len(run['assignment'])} workers, not {workers}. " \
+                          f"Use a new --schedule-run-id."
+                logging.error(log_str)
+                raise pytest.UsageError(log_str)
+            assigned = {i for worker in run['assignment'] for i in worker}
+            leftovers = [i for i in test_ids if i not in assigned]
+            if len(leftovers) > 0:
+                logging.info(f"Placing {len(leftovers)} tests not in run '{run_id}''s stored schedule.")
+                run['assignment'] = place_tests(run['assignment'], leftovers, self)
+            return run['assignment']
+
+    def record_worker(self, run_id, worker_index, predicted, actual):
+        with self._update() as data:
+            run = data['runs'].setdefault(run_id, {'assignment': None, 'workers': dict(), 'created': time.time()})
+            run['workers'][str(worker_index)] = {'predicted': predicted, 'actual': actual}
+        return
+
+    def _add_sample(self, table, name, sample):
+        if name not in table:
+            table[name] = {'mean': sample, 'count': 1}
+            return
+        entry = table[name]
+        entry['mean'] = self.smoothing * sample + (1 - self.smoothing) * entry['mean']
+        entry['count'] += 1
+        return
+
+    # File Handling
+
+    def _read(self):
+        if not os.path.isfile(self.filename):
+            return {'tests': dict(), 'steps': dict(), 'runs': dict()}
+        with open(self.filename) as f:
+            return json.load(f)
+
+    def _prune_runs(self):
+        runs = self._data['runs']
+        if len(runs) <= self.max_runs:
+            return
+        newest = sorted(runs, key=lambda i: runs[i]['created'], reverse=True)[:self.max_runs]
+        self._data['runs'] = {i: runs[i] for i in newest}
+        return
+
+    @contextlib.contextmanager
+    def _update(self):
+        with open(self.filename + '.lock', 'w') as lock:
+            _lock_file(lock)
+            try:
+                self._data = self._read()
+                yield self._data
+                self._prune_runs()
+                temp_filename = self.filename + '.tmp'
+                with open(temp_filename, 'w') as f:
+                    json.dump(self._data, f, indent=1, sort_keys=True)
+                os.replace(temp_filename, self.filename)
+            finally:
+                _unlock_file(lock)
+
+
+def _lock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_EX)
+    else:
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+    return
+
+
+def _unlock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_UN)
+    else:
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    return
+
+
+def schedule(test_ids, workers, history):
+    """
+    Longest-processing-time-first assignment of tests to workers.
+
+    :param list test_ids: list of str.
+    :param int workers:
+    :param TimingHistory history:
+    :returns list of lists of test ids, one per worker. Order within a worker follows test_ids.
+    """
+    expected = {i: history.expected_test_duration(i) for i in test_ids}
+    loads = [(0.0, worker) for worker in range(workers)]
+    assignment = [[] for _ in range(workers)]
+    # Ties are broken by test id, so every worker computes the same schedule.
+    for test_id in sorted(test_ids, key=lambda i: (-expected[i], i)):
+        load, worker = heapq.heappop(loads)
+        assignment[worker].append(test_id)
+        heapq.heappush(loads, (load + expected[test_id], worker))
+    order = {test_id: index for index, test_id in enumerate(test_ids)}
+    return [sorted(i, key=order.get) for i in assignment]
+
+
+def place_tests(assignment, test_ids, history):
+    """
+    Adds tests to an existing assignment, longest-expected-first onto the least-loaded worker.
+
+    :param list assignment: list of lists of test ids, one per worker.
+    :param list test_ids: Tests not in assignment.
+    :param TimingHistory history:
+    :returns list of lists of test ids:
+    """
+    expected = {i: history.expected_test_duration(i) for i in test_ids}
+    loads = [(predicted_load(tests, history), worker) for worker, tests in enumerate(assignment)]
+    heapq.heapify(loads)
+    result = [list(i) for i in assignment]
+    for test_id in sorted(test_ids, key=lambda i: (-expected[i], i)):
+        load, worker = heapq.heappop(loads)
+        result[worker].append(test_id)
+        heapq.heappush(loads, (load + expected[test_id], worker))
+    return result
+
+
+def predicted_load(test_ids, history):
+    return sum(history.expected_test_duration(i) for i in test_ids)
+
+
+def makespan(run):
+    """
+    :param dict run: See TimingHistory.run().
+    :returns tuple of (predicted, actual) seconds, or None if no worker has reported.
+    """
+    if run is None or len(run['workers']) == 0:
+        return None
+    workers = run['workers'].values()
+    return max(i['predicted'] for i in workers), max(i['actual'] for i in workers)
+
+
+# Pytest Plugin
+
+
+class SchedulerPlugin:
+    """
+    Registered by conftest.py. Records timings into the history and, if the run is
+    split across workers, deselects tests not assigned to this worker.
+    """
+
+    def __init__(self, history, workers=1, worker_index=0, run_id=None):
+        """
+        :raises pytest.UsageError if worker_index is out of range, or a multi-worker
+            run has no run_id (workers could compute different schedules).
+        """
+        if workers < 1:
+            log_str = f"--workers must be at least 1, not {workers}."
+            logging.error(log_str)
+            raise pytest.UsageError(log_str)
+        if not 0 <= worker_index < workers:
+            log_str = f"--worker-index must be from 0 to {workers - 1}, not {worker_index}."
+            logging.error(log_str)
+            raise pytest.UsageError(log_str)
+        if workers > 1 and run_id is None:
+            log_str = '--workers > 1 needs a --schedule-run-id shared by all workers, ' \
+                      'or workers may compute different schedules and drop or repeat tests.'
+            logging.error(log_str)
+            raise pytest.UsageError(log_str)
+        self.history = history
+        self.workers = workers
+        self.worker_index = worker_index
+        self.run_id = run_id
+        self.predicted = None
+        self._test_durations = dict()
+        self._step_durations = dict()
+        self._session_start = None
+        return
+
+    def pytest_collection_modifyitems(self, config, items):
+        if self.workers <= 1:
+            return
+        test_ids = [i.nodeid for i in items]
+
+        def compute():
+            return schedule(test_ids, self.workers, self.history)
+
+        assignment = self.history.assignment_for_run(self.run_id, test_ids, self.workers, compute)
+
+        mine = set(assignment[self.worker_index])
+        selected = [i for i in items if i.nodeid in mine]
+        deselected = [i for i in items if i.nodeid not in mine]
+        if len(deselected) > 0:
+            config.hook.pytest_deselected(items=deselected)
+        items[:] = selected
+        self.predicted = predicted_load(list(mine), self.history)
+        return
+
+    def pytest_sessionstart(self, session):
+        self._session_start = time.perf_counter()
+        step_hooks.add_hook(self._time_step)
+        return
+
+    def pytest_runtest_logreport(self, report):
+        self._test_durations.setdefault(report.nodeid, [0.0])[0] += report.duration
+        return
+
+    @contextlib.contextmanager
+    def _time_step(self, step_name, driver):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._step_durations.setdefault(step_name, []).append(time.perf_counter() - start_time)
+
+    def pytest_sessionfinish(self, session):
+        step_hooks.remove_hook(self._time_step)
+        self.history.record(test_durations=self._test_durations, step_durations=self._step_durations)
+        if self.run_id is not None and self.predicted is not None:
+            actual = time.perf_counter() - self._session_start
+            self.history.record_worker(self.run_id, self.worker_index, self.predicted, actual)
+        return
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if self.predicted is None:
+            return
+        terminalreporter.write_sep('-', 'schedule')
+        actual = time.perf_counter() - self._session_start
+        terminalreporter.write_line(f"Worker {self.worker_index}/{self.workers}: "
+                                    f"predicted {self.predicted:.1f}s, actual {actual:.1f}s.")
+        if self.run_id is not None:
+            result = makespan(self.history.run(self.run_id))
+            if result is not None:
+                terminalreporter.write_line(f"Run '{self.run_id}' makespan so far: "
+                                            f"predicted {result[0]:.1f}s, actual {result[1]:.1f}s.")
+        return
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Timing history and schedule reports.')
+    parser.add_argument('command', choices=['report', 'plan'])
+    parser.add_argument('--history', default=DEFAULT_HISTORY_FILENAME)
+    parser.add_argument('--run-id', help="Run to report on ('report').")
+    parser.add_argument('--workers', type=int, default=2, help="Workers to plan for ('plan').")
+    args = parser.parse_args()
+
+    history = TimingHistory(args.history)
+    if args.command == 'plan':
+        test_ids = history.test_ids()
+        for worker, test_ids in enumerate(schedule(test_ids, args.workers, history)):
+            print(f"Worker {worker}: predicted {predicted_load(test_ids, history):.1f}s")
+            for test_id in test_ids:
+                print(f"    {history.expected_test_duration(test_id):8.1f}s  {test_id}")
+        return
+
+    run = history.run(args.run_id)
+    if run is None:
+        print(f"No run '{args.run_id}' in {args.history}.")
+        return
+    for worker, times in sorted(run['workers'].items(), key=lambda i: int(i[0])):
+        print(f"Worker {worker}: predicted {times['predicted']:.1f}s, actual {times['actual']:.1f}s")
+    result = makespan(run)
+    if result is not None:
+        print(f"Makespan: predicted {result[0]:.1f}s, actual {result[1]:.1f}s")
+    return
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Measures cold-start cost: importing the test modules and collecting the tests.
+
+Each measurement runs in a fresh interpreter, so nothing is cached in-process.
+Also reports which heavy modules each import pulled in, to catch regressions
+where selenium (or numpy, ...) gets imported eagerly again.
+
+Usage:
+    python -m misc.startup_benchmark --runs 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+# selenium.common.exceptions is light and imported at module level; selenium.webdriver is the heavy part.
+HEAVY_MODULES = ('selenium.webdriver', 'numpy', 'PIL', 'sqlite3')
+
+_IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import tests.test_search, tests.test_sort
+elapsed = time.perf_counter() - start
+print(json.dumps({'elapsed': elapsed, 'loaded': [m for m in %r if m in sys.modules]}))
+"""
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_import(runs=5):
+    """
+    :returns dict: 'median' and 'samples' (seconds spent importing the test modules), 'loaded' (heavy modules).
+    """
+    samples = []
+    loaded = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', _IMPORT_SCRIPT % (HEAVY_MODULES,)], cwd=_ROOT, check=True,
+                                capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        samples.append(result['elapsed'])
+        loaded = result['loaded']
+    return {'median': statistics.median(samples), 'samples': samples, 'loaded': loaded}
+
+
+def measure_collection(runs=5):
+    """
+    :returns dict: 'median' and 'samples' (wall seconds for 'pytest --collect-only', including interpreter start).
+    """
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-m', 'pytest', '--collect-only', '-q', '-p', 'no:cacheprovider', 'tests'],
+                       cwd=_ROOT, check=True, capture_output=True)
+        samples.append(time.perf_counter() - start)
+    return {'median': statistics.median(samples), 'samples': samples}
+
+
+def measure_interpreter(runs=5):
+    """
+    :returns dict: 'median' and 'samples' for a bare interpreter start, as a baseline.
+    """
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'pass'], check=True)
+        samples.append(time.perf_counter() - start)
+    return {'median': statistics.median(samples), 'samples': samples}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark test import and collection time.')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='Print raw results as JSON.')
+    args = parser.parse_args()
+
+    results = {
+        'interpreter': measure_interpreter(args.runs),
+        'import': measure_import(args.runs),
+        'collection': measure_collection(args.runs),
+    }
+    if args.json:
+        print(json.dumps(results, indent=1))
+        return
+    print(f"Interpreter start:         {results['interpreter']['median'] * 1000:8.1f} ms (median of {args.runs})")
+    print(f"Import test modules:       {results['import']['median'] * 1000:8.1f} ms")
+    print(f"pytest --collect-only:     {results['collection']['median'] * 1000:8.1f} ms")
+    loaded = ', '.join(results['import']['loaded']) or 'none'
+    print(f"Heavy modules after import: {loaded}")
+    return
+
+
+if __name__ == '__main__':
+    main()
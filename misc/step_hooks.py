@@ -0,0 +1,62 @@
+"""
+Lets instrumentation (timing, profiling, ...) wrap every step in steps/.
+
+Steps are decorated with @step. A hook is a callable taking (step_name, driver)
+and returning a context manager, which is entered around every step call while
+the hook is registered. With no hooks registered, @step adds a single list check.
+
+The current test name is tracked here too, so hooks can tag what they record.
+"""
+
+import contextlib
+import functools
+
+
+_hooks = []
+_current_test = None
+
+
+def add_hook(hook):
+    if hook not in _hooks:
+        _hooks.append(hook)
+    return
+
+
+def remove_hook(hook):
+    if hook in _hooks:
+        _hooks.remove(hook)
+    return
+
+
+def set_current_test(name):
+    global _current_test
+    _current_test = name
+    return
+
+
+def current_test():
+    """
+    :returns str: Node ID of the running test. (Or None.)
+    """
+    return _current_test
+
+
+def step(func):
+    """
+    Decorator for step functions. Steps take the WebDriver as 'driver', either
+    as the first positional argument or by keyword.
+    """
+    name = f"{func.__module__}.{func.__name__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if len(_hooks) == 0:
+            return func(*args, **kwargs)
+        driver = kwargs.get('driver', args[0] if len(args) > 0 else None)
+        with contextlib.ExitStack() as stack:
+            for hook in list(_hooks):
+                stack.enter_context(hook(name, driver))
+            return func(*args, **kwargs)
+
+    wrapper.step_name = name
+    return wrapper
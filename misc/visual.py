@@ -0,0 +1,243 @@
+"""
+Screenshot comparison against stored baselines, vectorized with NumPy.
+
+Images are (height, width, 3) uint8 arrays, decoded from in-memory PNG bytes
+(no temp files). Each baseline is stored as a .npy file, loaded memory-mapped
+only when needed; an index caches each baseline's content digest and perceptual
+hash so unchanged images are accepted without touching the baseline pixels.
+
+Requires the optional packages numpy and Pillow.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+
+try:
+    import numpy as np
+    from PIL import Image
+except ImportError:
+    np = None
+    Image = None
+
+
+def _verify_dependencies():
+    if np is None or Image is None:
+        log_str = 'Visual checks require the optional packages numpy and Pillow.'
+        logging.error(log_str)
+        raise ImportError(log_str)
+    return
+
+
+def decode_png(png):
+    """
+    :param bytes png:
+    :returns ndarray: (height, width, 3) uint8.
+    """
+    _verify_dependencies()
+    with Image.open(io.BytesIO(png)) as image:
+        return np.asarray(image.convert('RGB'))
+
+
+def content_digest(image):
+    """
+    :returns str: Exact digest of the pixels and shape.
+    """
+    digest = hashlib.sha1(str(image.shape).encode())
+    digest.update(np.ascontiguousarray(image).data)
+    return digest.hexdigest()
+
+
+def _dct_matrix(size):
+    k = np.arange(size)[:, None]
+    n = np.arange(size)[None, :]
+    matrix = np.cos(np.pi * (2 * n + 1) * k / (2 * size)) * np.sqrt(2 / size)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+def _area_downsample(gray, size):
+    # Mean over (approximately) equal bins, via cumulative sums; works for any input size >= 1.
+    height, width = gray.shape
+    rows = np.linspace(0, height, size + 1).astype(int)
+    cols = np.linspace(0, width, size + 1).astype(int)
+    table = np.zeros((height + 1, width + 1))
+    table[1:, 1:] = gray.cumsum(axis=0).cumsum(axis=1)
+    r0, r1 = rows[:-1, None], np.maximum(rows[1:], rows[:-1] + 1)[:, None]
+    c0, c1 = cols[None, :-1], np.maximum(cols[1:], cols[:-1] + 1)[None, :]
+    r1 = np.minimum(r1, height)
+    c1 = np.minimum(c1, width)
+    sums = table[r1, c1] - table[r0, c1] - table[r1, c0] + table[r0, c0]
+    return sums / ((r1 - r0) * (c1 - c0))
+
+
+def perceptual_hash(image, hash_size=8, sample_size=32):
+    """
+    DCT-based perceptual hash.
+
+    :returns str: hex string of hash_size ** 2 bits.
+    """
+    gray = image[..., :3].astype(np.float64) @ np.array([0.299, 0.587, 0.114])
+    small = _area_downsample(gray, sample_size)
+    dct = _dct_matrix(sample_size)
+    low = (dct @ small @ dct.T)[:hash_size, :hash_size]
+    # The DC term is excluded from the median, as it only reflects overall brightness.
+    bits = (low > np.median(low.ravel()[1:])).ravel()
+    return format(int(''.join('1' if i else '0' for i in bits), 2), f"0{hash_size ** 2 // 4}x")
+
+
+class VisualDiff:
+    """
+    Result of comparing an image against its baseline.
+
+    :attribute str name:
+    :attribute str status: 'identical', 'similar' (within thresholds), 'different', or 'new' (no baseline).
+    :attribute number changed_pixel_ratio: Fraction of pixels beyond the pixel threshold.
+    :attribute int changed_blocks: Blocks whose mean difference is beyond the block threshold.
+    :attribute number max_block_difference: Highest mean per-block difference (0-255).
+    """
+
+    def __init__(self, name, status, changed_pixel_ratio=0.0, changed_blocks=0, max_block_difference=0.0):
+        self.name = name
+        self.status = status
+        self.changed_pixel_ratio = changed_pixel_ratio
+        self.changed_blocks = changed_blocks
+        self.max_block_difference = max_block_difference
+        return
+
+    @property
+    def passed(self):
+        return self.status != 'different'
+
+    def __str__(self):
+        if self.status != 'different':
+            return f"'{self.name}': {self.status}"
+        return (f"'{self.name}': different ({self.changed_pixel_ratio:.2%} of pixels, "
+                f"{self.changed_blocks} blocks, max block difference {self.max_block_difference:.1f})")
+
+
+def compare_images(name, actual, expected, pixel_threshold=16, block_size=16, block_threshold=8.0,
+                   max_changed_pixel_ratio=0.001):
+    """
+    Per-pixel and block-wise difference.
+
+    :param str name:
+    :param ndarray actual:
+    :param ndarray expected:
+    :param int pixel_threshold: A pixel changed if any channel differs by more than this.
+    :param int block_size: Side of the square blocks, in pixels.
+    :param number block_threshold: A block changed if its mean channel difference exceeds this.
+    :param number max_changed_pixel_ratio: Above this fraction of changed pixels, images are different.
+    :returns VisualDiff:
+    """
+    if actual.shape != expected.shape:
+        logging.debug(f"'{name}': shape {actual.shape} differs from baseline {expected.shape}.")
+        return VisualDiff(name, 'different', changed_pixel_ratio=1.0)
+
+    difference = np.abs(actual.astype(np.int16) - expected.astype(np.int16)).max(axis=2)
+    changed_pixel_ratio = float(np.count_nonzero(difference > pixel_threshold)) / difference.size
+
+    height, width = difference.shape
+    padded = np.zeros((-(-height // block_size) * block_size, -(-width // block_size) * block_size), np.float32)
+    padded[:height, :width] = difference
+    blocks = padded.reshape(padded.shape[0] // block_size, block_size, -1, block_size).mean(axis=(1, 3))
+    changed_blocks = int(np.count_nonzero(blocks > block_threshold))
+    max_block_difference = float(blocks.max()) if blocks.size > 0 else 0.0
+
+    if changed_pixel_ratio > max_changed_pixel_ratio or changed_blocks > 0:
+        status = 'different'
+    elif changed_pixel_ratio == 0:
+        status = 'identical'
+    else:
+        status = 'similar'
+    return VisualDiff(name, status, changed_pixel_ratio, changed_blocks, max_block_difference)
+
+
+class BaselineStore:
+    """
+    Directory of baseline images plus an index of their digests and perceptual hashes.
+
+    :attribute str directory:
+    :attribute bool trust_perceptual_hash: Accept an image without a pixel diff when its
+        perceptual hash equals the baseline's. Faster for large runs, but misses changes
+        too small to move the hash (e.g. a changed number or a single glyph), so off by default.
+    """
+
+    _index_filename = 'index.json'
+
+    def __init__(self, directory, trust_perceptual_hash=False, **compare_options):
+        _verify_dependencies()
+        self.directory = directory
+        self.trust_perceptual_hash = trust_perceptual_hash
+        self._compare_options = compare_options
+        os.makedirs(directory, exist_ok=True)
+        index_path = os.path.join(directory, self._index_filename)
+        if os.path.isfile(index_path):
+            with open(index_path) as f:
+                self._index = json.load(f)
+        else:
+            self._index = dict()
+        self._index_changed = False
+        return
+
+    def compare(self, name, image, update=False):
+        """
+        :param str name: Baseline name; anything outside [A-Za-z0-9_.-] is replaced.
+        :param ndarray image:
+        :param bool update: Replace the baseline with image if it differs (or is new).
+        :returns VisualDiff:
+        """
+        name = self._clean_name(name)
+        digest = content_digest(image)
+        entry = self._index.get(name)
+
+        if entry is not None and entry['digest'] == digest:
+            return VisualDiff(name, 'identical')
+        phash = perceptual_hash(image)
+        if entry is not None and self.trust_perceptual_hash and entry['phash'] == phash \
+                and tuple(entry['shape']) == image.shape:
+            return VisualDiff(name, 'similar')
+
+        if entry is None:
+            result = VisualDiff(name, 'new')
+        else:
+            expected = np.load(self._path(name), mmap_mode='r')
+            result = compare_images(name, image, expected, **self._compare_options)
+
+        if result.status == 'new' or (update is True and result.status == 'different'):
+            self._write(name, image, digest, phash)
+        return result
+
+    def save_index(self):
+        if not self._index_changed:
+            return
+        index_path = os.path.join(self.directory, self._index_filename)
+        with open(index_path + '.tmp', 'w') as f:
+            json.dump(self._index, f, indent=1, sort_keys=True)
+        os.replace(index_path + '.tmp', index_path)
+        self._index_changed = False
+        return
+
+    def _write(self, name, image, digest, phash):
+        logging.info(f"Saving visual baseline '{name}'.")
+        np.save(self._path(name), image)
+        self._index[name] = {'digest': digest, 'phash': phash, 'shape': list(image.shape)}
+        self._index_changed = True
+        return
+
+    def _path(self, name):
+        return os.path.join(self.directory, name + '.npy')
+
+    @staticmethod
+    def _clean_name(name):
+        return re.sub(r'[^A-Za-z0-9_.-]', '_', name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.save_index()
+        return
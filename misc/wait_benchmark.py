@@ -0,0 +1,151 @@
+"""
+Benchmarks the Loading wait strategies under injected network conditions.
+
+Runs load_page -> execute_search_query -> load_all_results with each poll
+interval through a FaultProxy, and reports total time and failures, so the
+fastest setting that doesn't flake can be picked.
+
+Usage:
+    python -m misc.wait_benchmark --routes routes.json --seed 42 --poll-intervals 0.1 0.25 0.5 --runs 3
+"""
+
+import argparse
+import logging
+import statistics
+import time
+
+from misc.fault_proxy import FaultProxy
+from misc.fault_proxy import delay_loader_removal
+from misc.fault_proxy import inject_xhr_faults
+from misc.fault_proxy import load_routes
+
+
+class BenchmarkResult:
+    """
+    Timings for a single poll interval.
+
+    :attribute number poll_interval:
+    :attribute list durations: Seconds taken by each successful run.
+    :attribute int failures: Number of runs which timed out or hit a WebDriverException
+        (e.g. an element missing because its request was dropped).
+    """
+
+    def __init__(self, poll_interval):
+        self.poll_interval = poll_interval
+        self.durations = []
+        self.failures = 0
+        return
+
+    @property
+    def mean_duration(self):
+        if len(self.durations) == 0:
+            return None
+        return statistics.mean(self.durations)
+
+    def __str__(self):
+        mean = 'n/a' if self.mean_duration is None else f"{self.mean_duration:.2f}s"
+        return f"poll_interval {self.poll_interval}s: mean {mean}, {self.failures} failures"
+
+
+def benchmark_wait_strategies(driver_factory, poll_intervals, query='th', runs=3, proxy=None, loader_delay=None,
+                              xhr_routes=None, seed=0):
+    """
+    :param callable driver_factory: Takes the proxy address (or None), returns a new WebDriver.
+    :param list poll_intervals: Values for Loading.poll_interval / Expanding.poll_interval.
+    :param str query: Search query to load all results for.
+    :param int runs: Runs per poll interval.
+    :param FaultProxy proxy: Reset before each run so every setting sees the same faults.
+    :param number loader_delay: See fault_proxy.delay_loader_removal().
+    :param list xhr_routes: Routes applied in the browser to XHR/fetch requests, see fault_proxy.inject_xhr_faults().
+    :param int seed: Seed for xhr_routes.
+    :returns list of BenchmarkResult:
+    """
+    # Deferred so this module can be imported without selenium.
+    from selenium.common.exceptions import WebDriverException
+
+    import page_objects.base
+    import steps.pokedex
+
+    original_intervals = (page_objects.base.Loading.poll_interval, page_objects.base.Expanding.poll_interval)
+    results = []
+    try:
+        for poll_interval in poll_intervals:
+            page_objects.base.Loading.poll_interval = poll_interval
+            page_objects.base.Expanding.poll_interval = poll_interval
+            result = BenchmarkResult(poll_interval)
+            for run in range(runs):
+                if proxy is not None:
+                    proxy.reset()
+                driver = driver_factory(None if proxy is None else proxy.address)
+                try:
+                    if loader_delay:
+                        delay_loader_removal(driver, loader_delay)
+                    if xhr_routes:
+                        inject_xhr_faults(driver, xhr_routes, seed=seed)
+                    start_time = time.perf_counter()
+                    steps.pokedex.load_page(driver=driver)
+                    steps.pokedex.execute_search_query(driver=driver, query=query)
+                    steps.pokedex.load_all_results(driver=driver)
+                    result.durations.append(time.perf_counter() - start_time)
+                except (TimeoutError, WebDriverException) as e:
+                    # Includes NoSuchElementException/ElementNotVisibleException from dropped requests.
+                    logging.info(f"poll_interval {poll_interval}s run {run} failed: {type(e).__name__}: {e}")
+                    result.failures += 1
+                finally:
+                    driver.quit()
+            logging.info(str(result))
+            results.append(result)
+    finally:
+        page_objects.base.Loading.poll_interval, page_objects.base.Expanding.poll_interval = original_intervals
+    return results
+
+
+def best_result(results):
+    """
+    :returns BenchmarkResult with the lowest mean duration and no failures. (Or None.)
+    """
+    candidates = [i for i in results if i.failures == 0 and i.mean_duration is not None]
+    if len(candidates) == 0:
+        return None
+    return min(candidates, key=lambda i: i.mean_duration)
+
+
+def _chrome_factory(proxy_address):
+    from selenium import webdriver
+
+    options = webdriver.ChromeOptions()
+    if proxy_address is not None:
+        options.add_argument(f"--proxy-server={proxy_address}")
+    driver = webdriver.Chrome(options=options)
+    driver.maximize_window()
+    return driver
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark wait strategies under injected faults.')
+    parser.add_argument('--routes', help='JSON file containing a list of routes, applied by the proxy.')
+    parser.add_argument('--xhr-routes', help='JSON file containing a list of routes, applied to XHR/fetch requests '
+                                             'in the browser. Works for HTTPS, unlike --routes path patterns.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--poll-intervals', type=float, nargs='+', default=[0.1, 0.25, 0.5])
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--query', default='th')
+    parser.add_argument('--loader-delay', type=float, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    routes = load_routes(args.routes) if args.routes else []
+    xhr_routes = load_routes(args.xhr_routes) if args.xhr_routes else None
+    with FaultProxy(routes=routes, seed=args.seed) as proxy:
+        results = benchmark_wait_strategies(_chrome_factory, args.poll_intervals, query=args.query, runs=args.runs,
+                                            proxy=proxy, loader_delay=args.loader_delay, xhr_routes=xhr_routes,
+                                            seed=args.seed)
+    for result in results:
+        print(result)
+    best = best_result(results)
+    print(f"Best: {best}" if best is not None else 'Best: none (every setting failed at least once)')
+    return
+
+
+if __name__ == '__main__':
+    main()
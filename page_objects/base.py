@@ -13,7 +13,162 @@ situations warrant multiple objects:
 import logging
 import time
 
-from selenium.webdriver.common.by import By
+from selenium.common.exceptions import ElementClickInterceptedException
+from selenium.common.exceptions import ElementNotVisibleException
+
+
+class _LazyBy:
+    """
+    Stands in for selenium's By, importing selenium.webdriver on first attribute access.
+
+    Locators are only built when page objects are instantiated (i.e. once there is
+    a driver), so importing page objects, steps or tests doesn't import selenium.webdriver.
+    """
+
+    def __getattr__(self, name):
+        from selenium.webdriver.common.by import By as SeleniumBy
+        return getattr(SeleniumBy, name)
+
+
+By = _LazyBy()
+
+
+# Scripts
+
+# Sets each [element, value] pair in arguments[0]. Checkboxes are clicked (which fires
+#   input/change natively) only if their state differs. Text values go through the
+#   native setter so frameworks tracking the property notice the change.
+_FILL_INPUTS_SCRIPT = """
+var valueSetter = Object.getOwnPropertyDescriptor(HTMLInputElement.prototype, 'value').set;
+arguments[0].forEach(function (pair) {
+    var element = pair[0], value = pair[1];
+    if (element.type === 'checkbox') {
+        if (element.checked !== value) {
+            element.click();
+        }
+        return;
+    }
+    valueSetter.call(element, value);
+    element.dispatchEvent(new Event('input', {bubbles: true}));
+    element.dispatchEvent(new Event('change', {bubbles: true}));
+});
+"""
+
+# Returns the requested properties, attributes and descendant texts of arguments[0],
+#   plus its page-relative geometry.
+_SNAPSHOT_SCRIPT = """
+var element = arguments[0];
+var snapshot = {properties: {}, attributes: {}, texts: {}};
+arguments[1].forEach(function (name) {
+    snapshot.properties[name] = element[name];
+});
+arguments[2].forEach(function (name) {
+    snapshot.attributes[name] = element.getAttribute(name);
+});
+var texts = arguments[3];
+Object.keys(texts).forEach(function (name) {
+    var child = element.querySelector(texts[name]);
+    snapshot.texts[name] = child === null ? null : child.innerText;
+});
+var rect = element.getBoundingClientRect();
+snapshot.rect = {x: rect.left + window.scrollX, y: rect.top + window.scrollY, width: rect.width, height: rect.height};
+return snapshot;
+"""
+
+# Scrolls arguments[0] into view below any sticky header (arguments[1], a CSS selector)
+#   plus an offset (arguments[2]), checks nothing covers its center, then clicks it if
+#   arguments[3] is true. Returns [status, detail].
+_SCROLL_INTO_VIEW_SCRIPT = """
+var element = arguments[0], headerSelector = arguments[1], offset = arguments[2], click = arguments[3];
+function isDisplayed(el) {
+    var style = getComputedStyle(el);
+    var rect = el.getBoundingClientRect();
+    return style.display !== 'none' && style.visibility !== 'hidden' && rect.width > 0 && rect.height > 0;
+}
+if (!isDisplayed(element)) {
+    return ['not_displayed', null];
+}
+var top = offset;
+if (headerSelector !== null) {
+    var header = document.querySelector(headerSelector);
+    if (header !== null && isDisplayed(header)) {
+        top += header.getBoundingClientRect().height;
+    }
+}
+element.scrollIntoView({block: 'center', inline: 'nearest'});
+var rect = element.getBoundingClientRect();
+if (rect.top < top) {
+    window.scrollBy(0, rect.top - top);
+    rect = element.getBoundingClientRect();
+}
+var hit = document.elementFromPoint(rect.left + rect.width / 2, rect.top + rect.height / 2);
+if (hit === null || (hit !== element && !element.contains(hit))) {
+    return ['covered', hit === null ? 'nothing' : hit.outerHTML.slice(0, 200)];
+}
+if (click) {
+    element.click();
+}
+return ['ok', null];
+"""
+
+# Optionally scrolls arguments[1] to just below the sticky header (arguments[2], a CSS
+#   selector), then returns the viewport-relative rects of the elements in arguments[0].
+_ELEMENT_RECTS_SCRIPT = """
+var elements = arguments[0], scrollTarget = arguments[1], headerSelector = arguments[2];
+var top = 0;
+if (headerSelector !== null) {
+    var header = document.querySelector(headerSelector);
+    if (header !== null) {
+        top = Math.max(header.getBoundingClientRect().bottom, 0);
+    }
+}
+if (scrollTarget !== null) {
+    scrollTarget.scrollIntoView({block: 'start', inline: 'nearest'});
+    window.scrollBy(0, -top);
+}
+return {
+    top: top,
+    ratio: window.devicePixelRatio,
+    width: window.innerWidth,
+    height: window.innerHeight,
+    rects: elements.map(function (element) {
+        var rect = element.getBoundingClientRect();
+        return [rect.left, rect.top, rect.right, rect.bottom];
+    })
+};
+"""
+
+# Flashes the elements in arguments[0] (or those matching the CSS selector arguments[1]) for
+#   arguments[2] milliseconds. The stylesheet is injected once; each element's class is removed
+#   by a browser-side timer, so nothing waits on the Python side. Returns the number highlighted.
+_HIGHLIGHT_SCRIPT = """
+if (document.getElementById('selenium-highlight-style') === null) {
+    var style = document.createElement('style');
+    style.id = 'selenium-highlight-style';
+    style.textContent = '@keyframes selenium-highlight-flash'
+        + ' { 0% { outline-color: red; } 50% { outline-color: transparent; } }'
+        + ' .selenium-highlight { outline-style: dashed !important; outline-width: 2px !important;'
+        + ' outline-color: red; animation: selenium-highlight-flash 0.4s step-end infinite !important; }';
+    document.head.appendChild(style);
+}
+var elements = arguments[0] !== null ? arguments[0]
+    : Array.prototype.slice.call(document.querySelectorAll(arguments[1]));
+var duration = arguments[2];
+elements.forEach(function (element) {
+    clearTimeout(element.__seleniumHighlightTimer);
+    element.classList.add('selenium-highlight');
+    element.__seleniumHighlightTimer = setTimeout(function () {
+        element.classList.remove('selenium-highlight');
+    }, duration);
+});
+return elements.length;
+"""
+
+_READ_INPUTS_SCRIPT = """
+return arguments[0].map(function (element) {
+    return element.type === 'checkbox' ? element.checked : element.value;
+});
+"""
 
 
 # Base Classes
@@ -40,8 +195,13 @@ class Loading(BaseDesc):
     Defines methods for elements with a loading state.
 
     Not to be instantiated directly.
+
+    :attribute number poll_interval: Seconds to sleep between checks in the
+        wait_until_* methods. Class-level so benchmarks can tune it globally.
     """
 
+    poll_interval = 0.5
+
     def __init__(self, desc='loading element'):
         super().__init__(desc=desc)
         return
@@ -74,7 +234,7 @@ class Loading(BaseDesc):
         """
         end_time = time.time() + time_limit
         while time.time() < end_time:
-            time.sleep(0.5)
+            time.sleep(self.poll_interval)
             if self.is_loaded():
                 return
         log_str = '{} did not load.'.format(self.desc)
@@ -102,7 +262,7 @@ class Loading(BaseDesc):
         """
         end_time = time.time() + time_limit
         while time.time() < end_time:
-            time.sleep(0.5)
+            time.sleep(self.poll_interval)
             if not self.is_loaded():
                 return
         log_str = '{} did not close.'.format(self.desc)
@@ -119,8 +279,12 @@ class Expanding(BaseDesc):
     Defines methods for elements with expanded/collapsed states.
 
     Not to be instantiated directly.
+
+    :attribute number poll_interval: See Loading.poll_interval.
     """
 
+    poll_interval = 0.5
+
     def __init__(self, desc='expanding element'):
         super().__init__(desc=desc)
         return
@@ -147,7 +311,7 @@ class Expanding(BaseDesc):
         """
         end_time = time.time() + time_limit
         while time.time() < end_time:
-            time.sleep(0.5)
+            time.sleep(self.poll_interval)
             if self.is_expanded():
                 return
         log_str = '{} did not expand.'.format(self.desc)
@@ -169,7 +333,7 @@ class Expanding(BaseDesc):
         """
         end_time = time.time() + time_limit
         while time.time() < end_time:
-            time.sleep(0.5)
+            time.sleep(self.poll_interval)
             if not self.is_expanded():
                 return
         log_str = '{} did not collapse.'.format(self.desc)
@@ -193,11 +357,21 @@ class BaseElement(BaseDesc):
     * If init with WebElement, the element must be found first
       via WebDriver.find_element() or WebDriver.find_elements().
 
+    Reads go through snapshot(), which fetches everything a subclass declares
+    in _snapshot_properties, _snapshot_attributes and _snapshot_texts in one
+    script call, and caches it until the next mutating action.
+
     :attribute WebDriver driver:
     :attribute WebElement element:
     :attribute str desc: Description of the element.
     """
 
+    # Extend these in subclasses with whatever their constructors/getters read.
+    _snapshot_properties = ('tagName',)
+    _snapshot_attributes = ()
+    # Name -> CSS selector of a descendant whose innerText is captured.
+    _snapshot_texts = dict()
+
     def __init__(self, driver=None, element=None, desc='element'):
         super().__init__(desc=desc)
         if driver is None and element is None:
@@ -209,6 +383,7 @@ class BaseElement(BaseDesc):
         else:
             self._driver = driver
         self._element = element
+        self._snapshot = None
         return
 
     @property
@@ -220,43 +395,112 @@ class BaseElement(BaseDesc):
         return self._element
 
     def is_displayed(self):
+        # WebDriver's own check (clipping, ancestors, ...) rather than the snapshot's. Never cached,
+        #   since the page changes visibility on its own.
         self._verify_element_is_defined()
         return self._element.is_displayed()
 
-    # Highlight
+    # Snapshot
 
-    def highlight(self, duration=3.0):
+    def snapshot(self, refresh=False):
         """
-        Highlights the element. Helpful for debugging locators.
+        Fetches the declared properties, attributes, descendant texts and geometry
+        of the element in a single script call.
 
-        :param number duration: Duration (in seconds) to highlight the WebElement.
-        :returns None:
+        :param bool refresh: Ignore the cached snapshot.
+        :returns dict: keys 'properties', 'attributes', 'texts' (dicts), and 'rect' (dict
+            with x, y, width, height).
+        """
+        if self._snapshot is None or refresh is True:
+            self._verify_element_is_defined()
+            self._snapshot = self.driver.execute_script(
+                _SNAPSHOT_SCRIPT,
+                self.element,
+                list(self._snapshot_properties),
+                list(self._snapshot_attributes),
+                self._snapshot_texts
+            )
+        return self._snapshot
+
+    def _invalidate_snapshot(self):
+        """
+        Call after any action which may change the element.
+        """
+        self._snapshot = None
+        return
+
+    # Screenshots
+
+    def capture_screenshot(self):
+        """
+        :returns bytes: PNG of the element, kept in memory.
         """
         self._verify_element_is_defined()
-        original_style = self.element.get_attribute('style')
-        highlighted_style = "border: 2px solid red; border-style: dashed;"
-        self._alternate_styles(original_style, highlighted_style, duration)
+        return self.element.screenshot_as_png
+
+    def capture_image(self):
+        """
+        :returns ndarray: (height, width, 3) uint8. Requires numpy and Pillow.
+        """
+        import misc.visual
+
+        return misc.visual.decode_png(self.capture_screenshot())
+
+    # Scrolling/Clicking
+
+    def scroll_into_view(self, sticky_header=None, offset=0):
+        """
+        Scrolls the element into view, clear of a sticky header, in a single script call.
+
+        :param str sticky_header: CSS selector of a fixed/sticky element covering the top of the viewport.
+        :param number offset: Extra pixels to keep between the element and the top of the viewport.
+        :raises ElementNotVisibleException if the element is not displayed.
+        :raises ElementClickInterceptedException if another element covers it after scrolling.
+        :returns None:
+        """
+        self._scroll_into_view(sticky_header=sticky_header, offset=offset, click=False)
         return
 
-    def _alternate_styles(self, style_value_1, style_value_2, duration):
-        end_time = time.time() + duration
-        while time.time() < end_time:
-            # Make sure the flashing ends on the original value, otherwise you end up with
-            #   the element permanently highlighted.
-            self._set_style(style_value=style_value_2)
-            time.sleep(0.2)
-            self._set_style(style_value=style_value_1)
-            time.sleep(0.2)
+    def scroll_into_view_and_click(self, sticky_header=None, offset=0):
+        """
+        Scrolls the element into view, verifies it isn't covered, then clicks it. All in
+        a single script call.
+
+        The click is a DOM click(), so it doesn't go through the driver's native input.
+
+        See: scroll_into_view()
+        """
+        logging.info("Clicking {}.".format(self.desc))
+        self._scroll_into_view(sticky_header=sticky_header, offset=offset, click=True)
+        self._invalidate_snapshot()
+        return
+
+    def _scroll_into_view(self, sticky_header, offset, click):
+        self._verify_element_is_defined()
+        status, detail = self.driver.execute_script(_SCROLL_INTO_VIEW_SCRIPT, self.element, sticky_header, offset,
+                                                    click)
+        if status == 'not_displayed':
+            log_str = '{} is not displayed.'.format(self.desc)
+            logging.error(log_str)
+            raise ElementNotVisibleException(log_str)
+        if status == 'covered':
+            log_str = '{} is covered by another element: {}'.format(self.desc, detail)
+            logging.error(log_str)
+            raise ElementClickInterceptedException(log_str)
         return
 
-    def _set_style(self, style_value):
+    # Highlight
+
+    def highlight(self, duration=3.0):
+        """
+        Flashes a dashed outline around the element. Helpful for debugging locators.
+        Returns immediately; the browser removes the highlight after duration.
+
+        :param number duration: Duration (in seconds) to highlight the WebElement.
+        :returns None:
+        """
         self._verify_element_is_defined()
-        self.driver.execute_script(
-            "arguments[0].setAttribute(arguments[1], arguments[2])",
-            self.element,
-            "style",
-            style_value
-        )
+        self.driver.execute_script(_HIGHLIGHT_SCRIPT, [self.element], None, duration * 1000)
         return
 
     # Misc
@@ -328,6 +572,121 @@ class BasePage(BaseLoadingElement):
         self.wait_until_loaded(time_limit=time_limit)
         return
 
+    def capture_screenshot(self):
+        """
+        :returns bytes: PNG of the viewport, kept in memory.
+        """
+        return self.driver.get_screenshot_as_png()
+
+    def capture_element_images(self, elements, sticky_header=None):
+        """
+        Captures many elements from as few viewport screenshots as possible.
+
+        Every element fully inside the viewport (and below the sticky header) is
+        cropped from one screenshot; the page is then scrolled to the next uncaptured
+        element. Elements that never fit are captured individually.
+
+        :param list elements: list of BaseElement.
+        :param str sticky_header: CSS selector of a fixed/sticky element covering the top of the viewport.
+        :returns list of ndarray, in the same order as elements. Requires numpy and Pillow.
+        """
+        import misc.visual
+
+        web_elements = [i.element for i in elements]
+        images = [None] * len(elements)
+        remaining = list(range(len(elements)))
+        scroll_target = None
+        while len(remaining) > 0:
+            info = self.driver.execute_script(
+                _ELEMENT_RECTS_SCRIPT,
+                [web_elements[i] for i in remaining],
+                None if scroll_target is None else web_elements[scroll_target],
+                sticky_header
+            )
+            screenshot = None
+            not_captured = []
+            for index, (left, top, right, bottom) in zip(remaining, info['rects']):
+                fits = left >= 0 and top >= info['top'] and right <= info['width'] and bottom <= info['height']
+                if not fits or right <= left or bottom <= top:
+                    not_captured.append(index)
+                    continue
+                if screenshot is None:
+                    screenshot = misc.visual.decode_png(self.capture_screenshot())
+                ratio = info['ratio']
+                images[index] = screenshot[round(top * ratio):round(bottom * ratio),
+                                           round(left * ratio):round(right * ratio)].copy()
+            if len(not_captured) > 0 and not_captured[0] == scroll_target:
+                # Already scrolled to it and it still doesn't fit (e.g. taller than the viewport).
+                images[scroll_target] = elements[scroll_target].capture_image()
+                not_captured = not_captured[1:]
+            remaining = not_captured
+            scroll_target = remaining[0] if len(remaining) > 0 else None
+        logging.debug('{}: captured {} element images.'.format(self.desc, len(images)))
+        return images
+
+    def highlight_elements(self, targets, duration=3.0):
+        """
+        Flashes a dashed outline around many elements with one script call, where
+        highlight() outlines only this element. Returns immediately; the browser
+        removes the highlights after duration.
+
+        :param targets: list of BaseElement/WebElement, or a locator tuple,
+            e.g. self._locators['search_result'].
+        :param number duration: Duration (in seconds) to highlight the elements.
+        :returns int: Number of elements highlighted.
+        """
+        elements = None
+        selector = None
+        if isinstance(targets, tuple):
+            if targets[0] == By.CSS_SELECTOR:
+                selector = targets[1]
+            else:
+                elements = self.driver.find_elements(*targets)
+        else:
+            elements = [i.element if isinstance(i, BaseElement) else i for i in targets]
+        count = self.driver.execute_script(_HIGHLIGHT_SCRIPT, elements, selector, duration * 1000)
+        logging.debug('{}: highlighted {} elements.'.format(self.desc, count))
+        return count
+
+    def fill_inputs(self, values, verify=True):
+        """
+        Sets many TextInput/Checkbox values in a single script call.
+
+        :param list values: list of (Input, value) pairs; str for TextInput, bool for Checkbox.
+        :param bool verify: Read every value back (in one more call) and compare.
+        :raises ValueError if verify is True and any value did not stick.
+        :returns None:
+        """
+        pairs = [[i.element, value] for i, value in values]
+        logging.info('{}: filling {} inputs.'.format(self.desc, len(pairs)))
+        self.driver.execute_script(_FILL_INPUTS_SCRIPT, pairs)
+        for input_object, _ in values:
+            input_object._invalidate_snapshot()
+        if verify is True:
+            self.verify_inputs(values)
+        return
+
+    def verify_inputs(self, values):
+        """
+        Reads every input value back in a single script call.
+
+        :param list values: list of (Input, expected value) pairs.
+        :raises ValueError if any value differs.
+        :returns None:
+        """
+        actual_values = self.driver.execute_script(_READ_INPUTS_SCRIPT, [i.element for i, _ in values])
+        mismatches = []
+        for (input_object, expected), actual in zip(values, actual_values):
+            if actual != expected:
+                mismatches.append((input_object, expected, actual))
+        if len(mismatches) > 0:
+            log_str = '{}: {} inputs do not have the expected value:\n'.format(self.desc, len(mismatches))
+            for input_object, expected, actual in mismatches:
+                log_str += "    '{}': expected '{}', got '{}'\n".format(input_object.desc, expected, actual)
+            logging.error(log_str)
+            raise ValueError(log_str)
+        return
+
 
 # Standard HTML Elements
 
@@ -338,26 +697,37 @@ class BasePage(BaseLoadingElement):
 class Input(BaseElement):
     """
     Represents an <input> HTML element.
+
+    :attribute bool fast_fill: Set values with a single script call (dispatching
+        input/change events) instead of driver clicks/keystrokes. Class-level
+        default; may be overridden per instance.
     """
 
-    def __init__(self, element, desc='input'):
+    fast_fill = False
+    _snapshot_attributes = BaseElement._snapshot_attributes + ('type', 'required')
+
+    def __init__(self, element, desc='input', fast_fill=None):
         super().__init__(element=element, desc=desc)
+        if fast_fill is not None:
+            self.fast_fill = fast_fill
         return
 
     def is_required(self):
         """
         :returns bool if element has 'required' attribute type.
         """
-        if self.element.get_attribute('required') == 'true':
+        # Boolean attribute: present (any value, usually '') means required.
+        if self.snapshot()['attributes']['required'] is not None:
             return True
         return False
 
     def _verify_type(self, input_type):
-        if self.element.tag_name != 'input':
-            log_str = "Class initialized with element type '{}'; expected 'input'.".format(self.element.tag_name)
+        tag_name = self.snapshot()['properties']['tagName'].lower()
+        if tag_name != 'input':
+            log_str = "Class initialized with element type '{}'; expected 'input'.".format(tag_name)
             logging.error(log_str)
             raise ValueError(log_str)
-        actual_input = self.element.get_attribute('type')
+        actual_input = self.snapshot()['attributes']['type']
         if actual_input != input_type:
             log_str = "Class initialized with input type '{}'; expected '{}'.".format(actual_input, input_type)
             logging.error(log_str)
@@ -370,14 +740,16 @@ class Checkbox(Input):
     Represents <input type="checkbox">.
     """
 
-    def __init__(self, element, desc='checkbox'):
-        super().__init__(element=element, desc=desc)
+    _snapshot_properties = Input._snapshot_properties + ('checked',)
+
+    def __init__(self, element, desc='checkbox', fast_fill=None):
+        super().__init__(element=element, desc=desc, fast_fill=fast_fill)
         self._verify_type(input_type='checkbox')
         return
 
     @property
     def selected(self):
-        return self.element.is_selected()
+        return self.snapshot()['properties']['checked']
 
     @selected.setter
     def selected(self, value):
@@ -385,9 +757,16 @@ class Checkbox(Input):
             log_str = "Checkbox must be given a bool, got {}.".format(type(value))
             logging.error(log_str)
             raise TypeError(log_str)
+        if self.fast_fill is True:
+            # The script only clicks if needed, so skip the is_selected() round trip.
+            logging.debug("'{}': fast-setting selected to {}.".format(self.desc, value))
+            self.driver.execute_script(_FILL_INPUTS_SCRIPT, [[self.element, value]])
+            self._invalidate_snapshot()
+            return
         if not self.selected == value:
             logging.info("Clicking '{}'...".format(self.desc))
             self.element.click()
+            self._invalidate_snapshot()
         else:
             if value is True:
                 logging.debug("'{}' is already selected; no need to click.".format(self.desc))
@@ -401,20 +780,28 @@ class TextInput(Input):
     Represents <input type="text">.
     """
 
-    def __init__(self, element, desc='single-line text field'):
-        super().__init__(element=element, desc=desc)
+    _snapshot_properties = Input._snapshot_properties + ('value',)
+
+    def __init__(self, element, desc='single-line text field', fast_fill=None):
+        super().__init__(element=element, desc=desc, fast_fill=fast_fill)
         self._verify_type(input_type='text')
         return
 
     @property
     def value(self):
-        return self.element.get_attribute('value')
+        return self.snapshot()['properties']['value']
 
     @value.setter
     def value(self, value):
+        if self.fast_fill is True:
+            logging.debug("'{}': fast-filling '{}'.".format(self.desc, value))
+            self.driver.execute_script(_FILL_INPUTS_SCRIPT, [[self.element, value]])
+            self._invalidate_snapshot()
+            return
         logging.info("'{}': Clearing field and entering '{}'...".format(self.desc, value))
         self.element.clear()
         self.element.send_keys(value)
+        self._invalidate_snapshot()
         return
 
 
@@ -456,6 +843,7 @@ class Dropdown(BaseElement):
             if option.text == requested_option:
                 logging.info("'{}': selecting '{}'...".format(self.desc, requested_option))
                 option.click()
+                self._invalidate_snapshot()
                 return
 
     @property
@@ -1,15 +1,118 @@
 import logging
 import time
+import weakref
 
 from selenium.common.exceptions import ElementNotVisibleException
-from selenium.webdriver.common.by import By
+from selenium.common.exceptions import NoSuchElementException
 
 from page_objects.base import BaseElement
 from page_objects.base import BaseLoadingElement
 from page_objects.base import BasePage
+from page_objects.base import By
 from page_objects.base import TextInput
 
 
+# Reads everything reset() needs to compare against a fresh load, in one call.
+_PAGE_STATE_SCRIPT = """
+var search = document.querySelector(arguments[0]);
+var sortLabel = document.querySelector(arguments[1]);
+var loadMore = document.querySelector(arguments[2]);
+// Every other form control (filters), as [name, checked or value].
+var filters = [];
+document.querySelectorAll('input, select, textarea').forEach(function (el, index) {
+    if (el === search) {
+        return;
+    }
+    var checkable = el.type === 'checkbox' || el.type === 'radio';
+    filters.push([el.name || el.id || String(index), checkable ? el.checked : el.value]);
+});
+return {
+    search: search === null ? null : search.value,
+    sort: sortLabel === null ? null : sortLabel.innerText.trim(),
+    sort_open: sortLabel !== null && sortLabel.classList.contains('opened'),
+    filters: filters,
+    results: document.querySelectorAll(arguments[3]).length,
+    load_more: loadMore !== null && loadMore.getClientRects().length > 0,
+    scroll_y: window.scrollY
+};
+"""
+
+# Number and name text of results arguments[1] up to arguments[1] + arguments[2] (exclusive),
+#   as [number, name] pairs. arguments[3] and arguments[4] select the number and name in a result.
+_RESULTS_SLICE_SCRIPT = """
+var elements = document.querySelectorAll(arguments[0]);
+var end = Math.min(arguments[1] + arguments[2], elements.length);
+var slice = [];
+for (var i = arguments[1]; i < end; i++) {
+    var number = elements[i].querySelector(arguments[3]);
+    var name = elements[i].querySelector(arguments[4]);
+    slice.push([number === null ? null : number.innerText, name === null ? null : name.innerText]);
+}
+return slice;
+"""
+
+_RESULT_ELEMENTS_SLICE_SCRIPT = """
+var elements = document.querySelectorAll(arguments[0]);
+return Array.prototype.slice.call(elements, arguments[1], arguments[1] + arguments[2]);
+"""
+
+# Installs the scroll health observers once per document, then starts a new round.
+#   arguments[0] is the search result selector.
+_SCROLL_MONITOR_BEGIN_SCRIPT = """
+var monitor = window.__pokedexScrollMonitor;
+if (monitor === undefined) {
+    monitor = {selector: arguments[0], observers: [], longTasks: [], roundStart: 0, startCount: 0, firstNewCard: null};
+    var mutations = new MutationObserver(function () {
+        if (monitor.firstNewCard === null && document.querySelectorAll(monitor.selector).length > monitor.startCount) {
+            monitor.firstNewCard = performance.now();
+        }
+    });
+    mutations.observe(document.body, {childList: true, subtree: true, attributes: true, attributeFilter: ['class']});
+    monitor.observers.push(mutations);
+    if (window.PerformanceObserver && (PerformanceObserver.supportedEntryTypes || []).indexOf('longtask') !== -1) {
+        var longTasks = new PerformanceObserver(function (list) {
+            list.getEntries().forEach(function (entry) {
+                monitor.longTasks.push(entry.duration);
+            });
+        });
+        longTasks.observe({type: 'longtask'});
+        monitor.observers.push(longTasks);
+    }
+    window.__pokedexScrollMonitor = monitor;
+}
+monitor.longTasks = [];
+monitor.startCount = document.querySelectorAll(monitor.selector).length;
+monitor.firstNewCard = null;
+monitor.roundStart = performance.now();
+return monitor.startCount;
+"""
+
+# Ends the round started by _SCROLL_MONITOR_BEGIN_SCRIPT. Times are in milliseconds.
+_SCROLL_MONITOR_END_SCRIPT = """
+var monitor = window.__pokedexScrollMonitor;
+var longTasks = monitor === undefined ? [] : monitor.longTasks;
+return {
+    dom_nodes: document.getElementsByTagName('*').length,
+    results: document.querySelectorAll(arguments[0]).length,
+    first_new_card: monitor === undefined || monitor.firstNewCard === null ? null
+        : monitor.firstNewCard - monitor.roundStart,
+    long_tasks: longTasks.length,
+    long_task_time: longTasks.reduce(function (total, duration) { return total + duration; }, 0)
+};
+"""
+
+_SCROLL_MONITOR_STOP_SCRIPT = """
+var monitor = window.__pokedexScrollMonitor;
+if (monitor !== undefined) {
+    monitor.observers.forEach(function (observer) { observer.disconnect(); });
+    delete window.__pokedexScrollMonitor;
+}
+"""
+
+# Driver -> state of the page right after its last full load and setup, for reset().
+_pristine_states = weakref.WeakKeyDictionary()
+
+
 class Page(BasePage):
 
     def __init__(self, driver):
@@ -29,6 +132,92 @@ class Page(BasePage):
         self._locators['footer'] = (By.CSS_SELECTOR, 'div.footer-divider')
         return
 
+    # State
+
+    def mark_pristine(self):
+        """
+        Records the current state as the freshly-loaded one that reset() returns to. Call
+        once the page is fully set up (loaded, cookies accepted).
+        """
+        _pristine_states[self.driver] = self.get_state()
+        return
+
+    def get_state(self):
+        """
+        :returns dict: search field value, sort label, whether the sort options are open,
+            filter form values, number of results loaded, whether 'Load More' is displayed,
+            and the scroll position.
+        """
+        return self.driver.execute_script(
+            _PAGE_STATE_SCRIPT,
+            self._locators['search_field'][1],
+            self._locators['sort_dropdown'][1] + ' label',
+            self._locators['load_more_button'][1],
+            self._locators['search_result'][1]
+        )
+
+    def is_pristine(self):
+        """
+        :returns bool: whether every part of get_state() matches the state recorded by mark_pristine().
+        """
+        pristine = _pristine_states.get(self.driver)
+        if pristine is None:
+            return False
+        state = self.get_state()
+        if state != pristine:
+            logging.debug(f"{self.desc} state {state} differs from fresh load {pristine}.")
+            return False
+        return True
+
+    def reset(self, time_limit=5.0):
+        """
+        Returns an already-loaded page to its freshly-loaded state in place: clears the
+        search field, restores the default sort, collapses loaded results and scrolls
+        to the top. Falls back to a full load if any part of the resulting state doesn't
+        match the fresh one, e.g. after a filter change (or the page was never fully loaded
+        with this driver).
+
+        :param number time_limit: See BasePage.load().
+        :returns bool: True if the soft reset worked, False if a full load was needed.
+        """
+        pristine = _pristine_states.get(self.driver)
+        if pristine is None:
+            logging.info(f"No fresh-load state recorded for {self.desc}; loading it fully.")
+            self._full_reload(time_limit=time_limit)
+            return False
+
+        logging.info(f"Resetting {self.desc} in place.")
+        state = self.get_state()
+        if state['sort_open']:
+            self.find_sort_dropdown_object().click_dropdown()
+        if state['sort'] != pristine['sort']:
+            self.find_sort_dropdown_object().selected_option = pristine['sort']
+            self.wait_until_loaded(time_limit=time_limit)
+        # Re-running the empty search re-renders only the first page of results.
+        self.find_search_field_text_input_object(fast_fill=True).value = ''
+        self.click_execute_search_button()
+        self.wait_until_loaded(time_limit=time_limit)
+        self.driver.execute_script('window.scrollTo(0, 0);')
+
+        if self.is_pristine():
+            return True
+        logging.warning(f"Soft reset of {self.desc} did not match a fresh load; loading it fully.")
+        self._full_reload(time_limit=time_limit)
+        return False
+
+    def _full_reload(self, time_limit):
+        self.load(time_limit=time_limit)
+        self.accept_cookies()
+        self.mark_pristine()
+        return
+
+    @property
+    def main_nav_selector(self):
+        """
+        CSS selector of the sticky nav, which covers the top of the viewport.
+        """
+        return self._locators['main_nav'][1]
+
     # Basic Filters
 
     def click_execute_search_button(self):
@@ -37,9 +226,9 @@ class Page(BasePage):
         element.click()
         return
 
-    def find_search_field_text_input_object(self):
+    def find_search_field_text_input_object(self, fast_fill=None):
         element = self.driver.find_element(*self._locators['search_field'])
-        return TextInput(element)
+        return TextInput(element, fast_fill=fast_fill)
 
     def find_sort_dropdown_object(self):
         element = self.driver.find_element(*self._locators['sort_dropdown'])
@@ -48,32 +237,87 @@ class Page(BasePage):
     # Search Results
 
     def all_search_results_names_displayed(self):
-        results = self.find_search_result_objects()
-        return [i.name for i in results]
+        return [name for number, name in self.iter_search_results()]
 
     def all_search_results_numbers_displayed(self):
-        results = self.find_search_result_objects()
-        return [i.number for i in results]
+        return [number for number, name in self.iter_search_results()]
 
     def no_results_found(self):
         return self.driver.find_element(*self._locators['no_results']).is_displayed()
 
     @property
     def number_of_results(self):
-        return len(self.find_search_result_objects())
+        return self.driver.execute_script('return document.querySelectorAll(arguments[0]).length;',
+                                          self._locators['search_result'][1])
 
     def find_search_result_objects(self):
         elements = self.driver.find_elements(*self._locators['search_result'])
         return [SearchResult(i) for i in elements]
 
+    def iter_search_results(self, batch_size=500):
+        """
+        Streams (number, name) text of the displayed results, in display order, fetching one
+        slice of batch_size results per script call. Only one batch is held at a time.
+
+        :param int batch_size:
+        :returns generator of (str, str) tuples.
+        """
+        for batch in self.iter_search_result_batches(batch_size=batch_size):
+            yield from batch
+        return
+
+    def iter_search_result_batches(self, batch_size=500):
+        """
+        :param int batch_size:
+        :returns generator of lists of up to batch_size (number, name) tuples.
+        """
+        texts = SearchResult._snapshot_texts
+        start = 0
+        while True:
+            batch = self.driver.execute_script(_RESULTS_SLICE_SCRIPT, self._locators['search_result'][1], start,
+                                               batch_size, texts['number'], texts['name'])
+            for offset, (number, name) in enumerate(batch):
+                if number is None or name is None:
+                    log_str = f"Search result {start + offset}: number or name not found."
+                    logging.error(log_str)
+                    raise NoSuchElementException(log_str)
+            if len(batch) > 0:
+                yield [(number.strip(), name.strip()) for number, name in batch]
+            if len(batch) < batch_size:
+                return
+            start += batch_size
+
+    def iter_search_result_objects(self, batch_size=100):
+        """
+        Like find_search_result_objects(), but fetches the elements one slice at a time.
+
+        :param int batch_size:
+        :returns generator of SearchResult.
+        """
+        for batch in self.iter_search_result_object_batches(batch_size=batch_size):
+            yield from batch
+        return
+
+    def iter_search_result_object_batches(self, batch_size=100):
+        """
+        :param int batch_size:
+        :returns generator of lists of up to batch_size SearchResult.
+        """
+        start = 0
+        while True:
+            elements = self.driver.execute_script(_RESULT_ELEMENTS_SLICE_SCRIPT, self._locators['search_result'][1],
+                                                  start, batch_size)
+            if len(elements) > 0:
+                yield [SearchResult(i) for i in elements]
+            if len(elements) < batch_size:
+                return
+            start += batch_size
+
     # Load More Button
 
     def click_load_more_button(self):
-        self._verify_load_more_button_is_displayed()
-        self.scroll_to_load_more_button()
-        element = self.driver.find_element(*self._locators['load_more_button'])
-        logging.info("Clicking 'Load More' button.")
-        element.click()
+        button = self._find_load_more_button_object()
+        button.scroll_into_view_and_click(sticky_header=self.main_nav_selector)
         return
 
     def load_more_button_is_displayed(self):
@@ -84,28 +328,19 @@ class Page(BasePage):
             return elements[0].is_displayed()
 
     def scroll_to_load_more_button(self):
-        self._verify_load_more_button_is_displayed()
-        load_more_button_element = self.driver.find_element(*self._locators['load_more_button'])
-
-        # This method scrolls and returns coordinates.
-        load_more_button_location = load_more_button_element.location_once_scrolled_into_view
-
-        # But this method alone isn't good enough. The nav could still cover the button, resulting in an
-        #   ElementClickInterceptedException.
-
-        nav_element = self.driver.find_element(*self._locators['main_nav'])
-        load_more_button_y = load_more_button_location['y']
-        if load_more_button_y < nav_element.size['height']:
-            scroll_distance = -(nav_element.size['height'] - load_more_button_y)
-            self.driver.execute_script("window.scrollBy(0,{})".format(scroll_distance))
+        # The nav is sticky and could still cover the button after a plain scroll, resulting in an
+        #   ElementClickInterceptedException, so scroll it clear of the nav.
+        button = self._find_load_more_button_object()
+        button.scroll_into_view(sticky_header=self.main_nav_selector)
         return
 
-    def _verify_load_more_button_is_displayed(self):
-        if not self.load_more_button_is_displayed():
+    def _find_load_more_button_object(self):
+        elements = self.driver.find_elements(*self._locators['load_more_button'])
+        if len(elements) == 0:
             log_str = "'Load More' button is not displayed."
             logging.error(log_str)
             raise ElementNotVisibleException(log_str)
-        return
+        return BaseElement(element=elements[0], desc="'Load More' button")
 
     # Misc
 
@@ -135,6 +370,108 @@ class Page(BasePage):
         element.location_once_scrolled_into_view
         return
 
+    def monitor_scroll_health(self, round_budget=None):
+        """
+        :param number round_budget: Max seconds per scroll round. (Or None.)
+        :returns ScrollHealthMonitor:
+        """
+        return ScrollHealthMonitor(page=self, round_budget=round_budget)
+
+
+class ScrollHealthMonitor:
+    """
+    Samples browser health around each scroll-loading round, to show where loading
+    more results gets slower as the page grows.
+
+    Call begin_round() before scrolling and end_round() once the new results have
+    loaded. Layout and style recalculation times come from the Chrome DevTools
+    Performance domain, so they are None with drivers that can't send CDP commands.
+
+    :attribute list timeline: One dict per round, see end_round().
+    :attribute number round_budget: Max seconds per round. (Or None.)
+    """
+
+    def __init__(self, page, round_budget=None):
+        self.page = page
+        self.round_budget = round_budget
+        self.timeline = []
+        self._round_start = None
+        self._start_metrics = None
+        self._cdp = hasattr(page.driver, 'execute_cdp_cmd')
+        if self._cdp:
+            try:
+                page.driver.execute_cdp_cmd('Performance.enable', dict())
+            except Exception as e:
+                logging.debug(f"CDP performance metrics unavailable: {e}")
+                self._cdp = False
+        return
+
+    def begin_round(self):
+        self.page.driver.execute_script(_SCROLL_MONITOR_BEGIN_SCRIPT, self.page._locators['search_result'][1])
+        self._start_metrics = self._performance_metrics()
+        self._round_start = time.perf_counter()
+        return
+
+    def end_round(self):
+        """
+        :returns dict: 'round' (index), 'duration' (seconds since begin_round()), 'results',
+            'new_results', 'dom_nodes', 'first_new_card' (milliseconds from begin_round() to the
+            first new result, or None), 'long_tasks' (count), 'long_task_time' (milliseconds),
+            'layout_time' and 'recalc_style_time' (seconds), and 'over_budget'.
+        """
+        duration = time.perf_counter() - self._round_start
+        sample = self.page.driver.execute_script(_SCROLL_MONITOR_END_SCRIPT, self.page._locators['search_result'][1])
+        end_metrics = self._performance_metrics()
+        previous_results = self.timeline[-1]['results'] if len(self.timeline) > 0 else None
+
+        entry = {'round': len(self.timeline), 'duration': duration}
+        entry.update(sample)
+        entry['new_results'] = None if previous_results is None else sample['results'] - previous_results
+        for name, metric in (('layout_time', 'LayoutDuration'), ('recalc_style_time', 'RecalcStyleDuration')):
+            if self._start_metrics is None or end_metrics is None:
+                entry[name] = None
+            else:
+                entry[name] = end_metrics.get(metric, 0.0) - self._start_metrics.get(metric, 0.0)
+        entry['over_budget'] = self.round_budget is not None and duration > self.round_budget
+        if entry['over_budget']:
+            logging.warning(f"Scroll round {entry['round']} took {duration:.2f}s, over the "
+                            f"{self.round_budget:.2f}s budget. {entry}")
+        else:
+            logging.debug(f"Scroll round {entry['round']}: {entry}")
+        self.timeline.append(entry)
+        self._round_start = None
+        return entry
+
+    def rounds_over_budget(self):
+        return [i for i in self.timeline if i['over_budget']]
+
+    def stop(self):
+        """
+        Removes the in-page observer and turns CDP performance metrics back off, since
+        both would otherwise stay on for later tests sharing the browser.
+        """
+        try:
+            self.page.driver.execute_script(_SCROLL_MONITOR_STOP_SCRIPT)
+        finally:
+            if self._cdp:
+                self._cdp = False
+                try:
+                    self.page.driver.execute_cdp_cmd('Performance.disable', dict())
+                except Exception as e:
+                    logging.debug(f"Could not disable CDP performance metrics: {e}")
+        return
+
+    def _performance_metrics(self):
+        if not self._cdp:
+            return None
+        try:
+            result = self.page.driver.execute_cdp_cmd('Performance.getMetrics', dict())
+        except Exception as e:
+            logging.debug(f"CDP performance metrics unavailable: {e}")
+            self._cdp = False
+            return None
+        return {i['name']: i['value'] for i in result['metrics']}
+
 
 class SortDropdown(BaseElement):
 
@@ -150,6 +487,7 @@ class SortDropdown(BaseElement):
     def click_dropdown(self):
         logging.info(f"Clicking {self.desc}.")
         self.element.click()
+        self._invalidate_snapshot()
         time.sleep(0.1)
         return
 
@@ -180,6 +518,7 @@ class SortDropdown(BaseElement):
         element = self._find_option_element(option=option)
         logging.info(f"Clicking sort option '{option}'.")
         element.click()
+        self._invalidate_snapshot()
         return
 
     def _find_option_element(self, option):
@@ -212,23 +551,32 @@ class SortDropdown(BaseElement):
 
 class SearchResult(BaseElement):
 
+    # Name and number are read through the snapshot, so wrapping a result is one round trip.
+    _snapshot_texts = {
+        'name': 'h5',
+        'number': 'p.id',
+    }
+
     def __init__(self, element):
         super().__init__(element=element, desc='Search Result')
-
-        self._locators = dict()
-        self._locators['name'] = (By.CSS_SELECTOR, 'h5')
-        self._locators['number'] = (By.CSS_SELECTOR, 'p.id')
-
         self.desc = f"Search Result - {self.number} {self.name}"
         return
 
     @property
     def name(self):
-        return self.element.find_element(*self._locators['name']).text
+        return self._find_text('name')
 
     @property
     def number(self):
-        return self.element.find_element(*self._locators['number']).text
+        return self._find_text('number')
+
+    def _find_text(self, name):
+        text = self.snapshot()['texts'][name]
+        if text is None:
+            log_str = f"{self.desc}: '{self._snapshot_texts[name]}' not found."
+            logging.error(log_str)
+            raise NoSuchElementException(log_str)
+        return text.strip()
 
     def __str__(self):
         return self.desc
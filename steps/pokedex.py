@@ -1,11 +1,17 @@
+import contextlib
+import itertools
 import logging
+import os
 
+import misc.result_snapshot
 import page_objects.pokedex
+from misc.step_hooks import step
 
 
 # Searching
 
 
+@step
 def execute_search_query(driver, query):
     page = page_objects.pokedex.Page(driver)
     search_field = page.find_search_field_text_input_object()
@@ -15,21 +21,58 @@ def execute_search_query(driver, query):
     return
 
 
-def verify_search_field_results(driver, query):
+@step
+def verify_search_field_results(driver, query, oracle=None):
+    """
+    Results are streamed in batches; the first one not matching query fails the step.
+
+    :param misc.oracle.OracleStore oracle: If given, also verify no results are missing, unexpected
+        or displayed more than once. All results must be loaded first (see load_all_results).
+    """
     page = page_objects.pokedex.Page(driver)
-    search_results = page.find_search_result_objects()
-    for result in search_results:
-        if query.lower() not in result.name.lower() and query.lower() not in result.number:
-            log_str = f"Test failed. Search query '{query}' verification failed for '{result}'."
+    expected_results = None
+    if oracle is not None:
+        expected_results = set(oracle.expected_results(query, 'lowest number (first)'))
+    seen = set()
+    unexpected = []
+    duplicates = []
+    total_results = 0
+    for number, name in page.iter_search_results():
+        total_results += 1
+        if query.lower() not in name.lower() and query.lower() not in number:
+            log_str = f"Test failed. Search query '{query}' verification failed for 'Search Result - {number} {name}'."
             logging.error(log_str)
             raise AssertionError(log_str)
-    logging.debug(f"Search verification passed. {len(search_results)} total results found.")
+        if expected_results is None:
+            continue
+        # A repeated card is reported as a duplicate, whether or not the oracle expects it once.
+        if (number, name) in seen:
+            duplicates.append((number, name))
+            continue
+        seen.add((number, name))
+        if (number, name) in expected_results:
+            expected_results.remove((number, name))
+        else:
+            unexpected.append((number, name))
+
+    if expected_results is not None and (len(expected_results) > 0 or len(unexpected) > 0 or len(duplicates) > 0):
+        log_str = f"Test failed. Search query '{query}' results differ from the oracle.\n"
+        for title, results in (('Missing', expected_results), ('Unexpected', unexpected), ('Duplicate', duplicates)):
+            log_str += f"\t{title} results:\n"
+            for number, name in sorted(results):
+                log_str += f"\t\t{number} {name}\n"
+        log_str = log_str[:-1]
+        logging.error(log_str)
+        raise AssertionError(log_str)
+
+    logging.debug(f"Search verification passed. {total_results} total results found.")
     return
 
 
 # Sorting
 
 
+@step
 def set_sort_method(driver, sort_method):
     page = page_objects.pokedex.Page(driver)
     sort_dropdown = page.find_sort_dropdown_object()
@@ -38,7 +81,13 @@ def set_sort_method(driver, sort_method):
     return
 
 
-def verify_sort_method(driver, sort_method):
+@step
+def verify_sort_method(driver, sort_method, oracle=None, query=''):
+    """
+    :param misc.oracle.OracleStore oracle: If given, also verify the displayed results are the
+        first results the oracle expects for query under sort_method.
+    :param str query: Search query the results were filtered by. Only used with oracle.
+    """
     ascending_methods = {'lowest number (first)', 'a-z'}
     descending_methods = {'highest number (first)', 'z-a'}
     name_methods = {'a-z', 'z-a'}
@@ -51,39 +100,178 @@ def verify_sort_method(driver, sort_method):
         raise ValueError(log_str)
 
     page = page_objects.pokedex.Page(driver)
+    column = 1 if sort_method.lower() in name_methods else 0
+    oracle_results = None
+    if oracle is not None:
+        oracle_results = oracle.expected_results(query, sort_method)
 
-    if sort_method.lower() in name_methods:
-        actual_results = page.all_search_results_names_displayed()
-    else:
-        actual_results = page.all_search_results_numbers_displayed()
-    total_results = len(actual_results)
-
-    expected_results = actual_results.copy()
-    if sort_method.lower() in ascending_methods:
-        expected_results.sort()
-    else:
-        expected_results.sort(reverse=True)
-
-    if actual_results != expected_results:
-        log_str = f"Sort method '{sort_method} verification failed. {total_results} total results found.\n"
-        log_str += "\tActual results:\n"
-        for i in actual_results:
-            log_str += f"\t\t{i}\n"
-        log_str += "\tExpected results:\n"
-        for i in expected_results:
-            log_str += f"\t\t{i}\n"
-        log_str = log_str[:-1]
+    # Checked pairwise as results stream in, so the first out-of-order pair fails the step.
+    previous = None
+    total_results = 0
+    for position, result in enumerate(page.iter_search_results()):
+        value = result[column]
+        total_results += 1
+        if previous is not None:
+            if (sort_method.lower() in ascending_methods and previous > value) \
+                    or (sort_method.lower() in descending_methods and previous < value):
+                _fail_sort_verification(sort_method, position, f"'{value}' is displayed after '{previous}'.")
+        if oracle_results is not None:
+            if position >= len(oracle_results):
+                _fail_sort_verification(sort_method, position, f"'{value}' is beyond the oracle's results.")
+            expected = oracle_results[position][column]
+            if expected != value:
+                _fail_sort_verification(sort_method, position,
+                                        f"'{value}' is displayed; the oracle expects '{expected}'.")
+        previous = value
+
+    logging.info(f"Sort method '{sort_method} verification passed. {total_results} total results found.")
+    return
+
+
+def _fail_sort_verification(sort_method, position, reason):
+    log_str = f"Sort method '{sort_method} verification failed at result {position}: {reason}"
+    logging.error(log_str)
+    raise AssertionError(log_str)
+
+
+# Oracle
+
+
+@step
+def build_oracle(driver, filename, max_age=None, refresh=False):
+    """
+    Opens the oracle store, harvesting the full dataset (empty query, all results loaded)
+    into it unless the stored probe still matches and the last harvest is recent enough
+    (see misc.oracle.OracleStore.is_current). Leaves the page on the empty query, sorted
+    lowest number first.
+
+    :param str filename:
+    :param number max_age: Seconds after which a full harvest is due even if the probe matches.
+        (Or None for never.)
+    :param bool refresh: Always harvest.
+    :returns misc.oracle.OracleStore:
+    """
+    # sqlite3 is only imported when the oracle is actually used.
+    import misc.oracle
+
+    probe = probe_dataset(driver=driver)
+    oracle = misc.oracle.OracleStore(filename)
+    if not refresh and oracle.is_current(probe, max_age=max_age):
+        logging.info(f"Oracle '{filename}' matches the dataset probe; skipping the harvest.")
+        return oracle
+
+    load_all_results(driver=driver)
+    page = page_objects.pokedex.Page(driver=driver)
+    entries = list(page.iter_search_results())
+    oracle.rebuild(entries, probe=probe)
+    return oracle
+
+
+@step
+def probe_dataset(driver):
+    """
+    Fingerprints the first page of results under lowest and highest number sort, and
+    the number of results shown, without loading more. See misc.oracle.probe_fingerprint.
+
+    :returns str:
+    """
+    import misc.oracle
+
+    page = page_objects.pokedex.Page(driver=driver)
+    set_sort_method(driver=driver, sort_method='highest number (first)')
+    execute_search_query(driver=driver, query='')
+    last_entries = list(page.iter_search_results())
+    set_sort_method(driver=driver, sort_method='lowest number (first)')
+    first_entries = list(page.iter_search_results())
+    return misc.oracle.probe_fingerprint(first_entries, last_entries, count=page.number_of_results)
+
+
+# Snapshots
+
+
+@step
+def verify_results_snapshot(driver, query, sort_method, directory, update=False):
+    """
+    Compares the displayed results against the snapshot stored for this query and sort
+    order by a previous run, and fails on drift. The first run just stores the snapshot.
+
+    On drift, the current results are left next to the stored snapshot as '<snapshot>.new',
+    for inspection with misc.result_snapshot.diff_files(). Rerun with update=True to accept them.
+    """
+    page = page_objects.pokedex.Page(driver=driver)
+    baseline = misc.result_snapshot.snapshot_path(directory, query, sort_method)
+    candidate = baseline + '.new'
+    # Streamed from the page into the file, one batch of results at a time.
+    entries = ((misc.result_snapshot.parse_number(number), name) for number, name in page.iter_search_results())
+    count = misc.result_snapshot.write_snapshot(candidate, entries)
+
+    if not os.path.isfile(baseline):
+        os.replace(candidate, baseline)
+        logging.info(f"Stored first results snapshot for '{query}' / '{sort_method}': {count} results.")
+        return
+
+    diff = misc.result_snapshot.diff_files(baseline, candidate)
+    if diff.is_empty or update:
+        os.replace(candidate, baseline)
+    if not diff.is_empty and not update:
+        log_str = f"Test failed. Results for '{query}' / '{sort_method}' drifted from the stored snapshot " \
+                  f"(current results kept in '{candidate}'):\n{diff}"
         logging.error(log_str)
         raise AssertionError(log_str)
+    logging.info(f"Results snapshot verification passed for '{query}' / '{sort_method}'. {count} results.")
+    return
 
-    logging.info(f"Sort method '{sort_method} verification passed. {total_results} total results found.")
+
+# Visuals
+
+
+@step
+def verify_visuals(driver, baseline_directory, update_baselines=False):
+    """
+    Compares every loaded search result card and the sort dropdown against stored
+    baselines. Missing baselines are created. Requires numpy and Pillow.
+
+    Cards are captured and compared one batch at a time, so only a batch of images is held.
+    """
+    # numpy/Pillow are only imported when visual checks actually run.
+    import misc.visual
+
+    page = page_objects.pokedex.Page(driver=driver)
+    batches = itertools.chain(page.iter_search_result_object_batches(batch_size=50),
+                              [[page.find_sort_dropdown_object()]])
+    failures = []
+    total_compared = 0
+    with misc.visual.BaselineStore(baseline_directory) as store:
+        for batch in batches:
+            names = [f"search_result_{i.number}" if isinstance(i, page_objects.pokedex.SearchResult)
+                     else 'sort_dropdown' for i in batch]
+            images = page.capture_element_images(batch, sticky_header=page.main_nav_selector)
+            for name, image in zip(names, images):
+                diff = store.compare(name, image, update=update_baselines)
+                total_compared += 1
+                if not diff.passed:
+                    failures.append(diff)
+
+    if len(failures) > 0 and not update_baselines:
+        log_str = f"Test failed. {len(failures)} of {total_compared} elements differ from their visual baselines:\n"
+        for i in failures:
+            log_str += f"\t{i}\n"
+        log_str = log_str[:-1]
+        logging.error(log_str)
+        raise AssertionError(log_str)
+    logging.info(f"Visual verification passed. {total_compared} elements compared.")
     return
 
 
 # Misc
 
 
-def load_all_results(driver):
+@step
+def load_all_results(driver, monitor=None):
+    """
+    :param page_objects.pokedex.ScrollHealthMonitor monitor: If given, every round of loading
+        (the 'Load More' click, then each scroll to the footer) is recorded in its timeline.
+    """
     page = page_objects.pokedex.Page(driver=driver)
 
     if page.no_results_found():
@@ -91,21 +279,106 @@ def load_all_results(driver):
         return
 
     if page.load_more_button_is_displayed():
-        page.click_load_more_button()
-        page.wait_until_loaded()
+        with _scroll_round(monitor):
+            page.click_load_more_button()
+            page.wait_until_loaded()
 
     number_of_results_changed = True
     while number_of_results_changed:
         number_of_results_before_scroll = page.number_of_results
-        page.scroll_to_footer()
-        page.wait_until_loaded()
+        with _scroll_round(monitor):
+            page.scroll_to_footer()
+            page.wait_until_loaded()
         if number_of_results_before_scroll == page.number_of_results:
             number_of_results_changed = False
     return
 
 
+@step
+def start_scroll_health_monitor(driver, round_budget=None):
+    """
+    :param number round_budget: Max seconds per scroll round; see verify_scroll_health.
+    :returns page_objects.pokedex.ScrollHealthMonitor: Pass it to load_all_results.
+    """
+    page = page_objects.pokedex.Page(driver=driver)
+    return page.monitor_scroll_health(round_budget=round_budget)
+
+
+@contextlib.contextmanager
+def scroll_health_monitor(driver, round_budget=None):
+    """
+    Like start_scroll_health_monitor, but stops the monitor on exit, even if the block fails.
+    The monitor's MutationObserver otherwise outlives the test and slows down every later
+    test sharing the browser.
+
+    :param number round_budget: See start_scroll_health_monitor.
+    :returns page_objects.pokedex.ScrollHealthMonitor:
+    """
+    monitor = start_scroll_health_monitor(driver=driver, round_budget=round_budget)
+    try:
+        yield monitor
+    finally:
+        monitor.stop()
+
+
+@contextlib.contextmanager
+def _scroll_round(monitor):
+    if monitor is None:
+        yield
+        return
+    monitor.begin_round()
+    try:
+        yield
+    finally:
+        # Recorded even if the round timed out, since that round is the interesting one.
+        monitor.end_round()
+
+
+@step
+def verify_scroll_health(driver, monitor):
+    """
+    Fails if any round recorded by monitor went over its round budget.
+
+    :param WebDriver driver:
+    :param page_objects.pokedex.ScrollHealthMonitor monitor:
+    """
+    over_budget = monitor.rounds_over_budget()
+    if len(over_budget) > 0:
+        log_str = f"Test failed. {len(over_budget)} of {len(monitor.timeline)} scroll rounds went over the " \
+                  f"{monitor.round_budget}s budget:\n"
+        for i in monitor.timeline:
+            log_str += f"\t{'!' if i['over_budget'] else ' '} round {i['round']}: {i['duration']:.2f}s, " \
+                       f"{i['results']} results, {i['dom_nodes']} DOM nodes, " \
+                       f"first new card {_format_optional(i['first_new_card'], 'ms')}, " \
+                       f"{i['long_tasks']} long tasks ({i['long_task_time']:.0f}ms), " \
+                       f"layout {_format_optional(i['layout_time'], 's')}, " \
+                       f"recalc style {_format_optional(i['recalc_style_time'], 's')}\n"
+        log_str = log_str[:-1]
+        logging.error(log_str)
+        raise AssertionError(log_str)
+    logging.info(f"Scroll health verification passed. {len(monitor.timeline)} rounds.")
+    return
+
+
+def _format_optional(value, unit):
+    return 'n/a' if value is None else f"{value:.3g}{unit}"
+
+
+@step
 def load_page(driver):
     page = page_objects.pokedex.Page(driver=driver)
     page.load()
     page.accept_cookies()
+    page.mark_pristine()
+    return
+
+
+@step
+def reset_page(driver):
+    """
+    Returns the page to its freshly-loaded state without reloading it, if possible.
+    Loads it fully if it was never loaded with this driver or the soft reset fails.
+    """
+    page = page_objects.pokedex.Page(driver=driver)
+    page.reset()
     return
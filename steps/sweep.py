@@ -0,0 +1,149 @@
+import itertools
+import json
+import logging
+import os
+import string
+import time
+
+from selenium.common.exceptions import WebDriverException
+
+import page_objects.pokedex
+import steps.pokedex
+from misc.step_hooks import step
+
+
+def default_sweep_queries(max_number=1025):
+    """
+    Every 1- and 2-letter prefix, followed by every Pokedex number.
+
+    :param int max_number: Highest Pokedex number to include.
+    :returns list of str:
+    """
+    letters = string.ascii_lowercase
+    queries = list(letters)
+    queries += [a + b for a, b in itertools.product(letters, repeat=2)]
+    queries += [str(i) for i in range(1, max_number + 1)]
+    return queries
+
+
+class SweepReport:
+    """
+    Progress of a query sweep. Serializable so long sweeps can be resumed.
+
+    :attribute list completed: Queries which passed, in order.
+    :attribute dict failures: Query -> failure message. Retried on resume.
+    :attribute int runs: Queries run, including failures and retries, across resumes.
+    :attribute number elapsed: Seconds spent running queries, across resumes.
+    """
+
+    def __init__(self, completed=None, failures=None, elapsed=0.0, runs=None):
+        self.failures = failures if failures is not None else dict()
+        # Older checkpoints also listed failed queries as completed.
+        self.completed = [i for i in completed if i not in self.failures] if completed is not None else []
+        self.elapsed = elapsed
+        self.runs = runs if runs is not None else len(self.completed) + len(self.failures)
+        return
+
+    @property
+    def queries_per_minute(self):
+        if self.elapsed == 0:
+            return 0.0
+        return self.runs / self.elapsed * 60
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename) as f:
+            return cls(**json.load(f))
+
+    def save(self, filename):
+        # Write then rename, so an interrupted save doesn't lose the previous checkpoint.
+        temp_filename = filename + '.tmp'
+        with open(temp_filename, 'w') as f:
+            json.dump({'completed': self.completed, 'failures': self.failures, 'elapsed': self.elapsed,
+                       'runs': self.runs}, f)
+        os.replace(temp_filename, filename)
+        return
+
+    def __str__(self):
+        return (f"{len(self.completed)} queries passed, {len(self.failures)} failed, "
+                f"{self.queries_per_minute:.1f} queries/minute.")
+
+
+@step
+def run_query_sweep(driver, queries, checkpoint=None, checkpoint_every=25, fast_fill=False):
+    """
+    Runs search -> load all results -> verify for each query on a single loaded page.
+
+    The page must already be loaded (see steps.pokedex.load_page). Only the search
+    field is reset between queries. Verification failures, timeouts and WebDriver errors
+    are recorded against their query, not raised, so one bad query doesn't end the sweep.
+    Only passing queries count as completed, so resuming retries the failed ones.
+
+    :param WebDriver driver:
+    :param list queries: list of str.
+    :param str checkpoint: Filename to save progress to. If it exists, queries it
+        lists as completed (passed) are skipped.
+    :param int checkpoint_every: Save the checkpoint after this many queries.
+    :param bool fast_fill: Set the search field with one script call instead of keystrokes.
+    :returns SweepReport:
+    """
+    if checkpoint is not None and os.path.isfile(checkpoint):
+        report = SweepReport.load(checkpoint)
+        logging.info(f"Resuming sweep from '{checkpoint}': {report}")
+    else:
+        report = SweepReport()
+
+    done = set(report.completed)
+    remaining = [i for i in queries if i not in done]
+    logging.info(f"Sweeping {len(remaining)} queries ({len(done)} already completed, "
+                 f"{len([i for i in remaining if i in report.failures])} retried).")
+
+    page = page_objects.pokedex.Page(driver=driver)
+    search_field = None
+    since_checkpoint = 0
+    try:
+        for query in remaining:
+            start_time = time.perf_counter()
+            try:
+                if search_field is None:
+                    search_field = page.find_search_field_text_input_object(fast_fill=fast_fill)
+                search_field.value = query
+                page.click_execute_search_button()
+                page.wait_until_loaded()
+                steps.pokedex.load_all_results(driver=driver)
+                steps.pokedex.verify_search_field_results(driver=driver, query=query)
+                report.failures.pop(query, None)
+                report.completed.append(query)
+            except AssertionError as e:
+                report.failures[query] = str(e)
+            except (TimeoutError, WebDriverException) as e:
+                report.failures[query] = f"{type(e).__name__}: {e}"
+                # The page may have changed under the cached field (e.g. a stale element).
+                search_field = None
+            report.elapsed += time.perf_counter() - start_time
+            report.runs += 1
+
+            since_checkpoint += 1
+            if since_checkpoint >= checkpoint_every:
+                since_checkpoint = 0
+                logging.info(f"Sweep progress: {report}")
+                if checkpoint is not None:
+                    report.save(checkpoint)
+    finally:
+        # Also on an unexpected error, so finished queries aren't lost.
+        if checkpoint is not None:
+            report.save(checkpoint)
+    logging.info(f"Sweep finished: {report}")
+    return report
+
+
+def verify_sweep_passed(report):
+    if len(report.failures) > 0:
+        log_str = f"Test failed. {len(report.failures)} sweep queries failed verification:\n"
+        for query, message in report.failures.items():
+            log_str += f"\t'{query}': {message}\n"
+        log_str = log_str[:-1]
+        logging.error(log_str)
+        raise AssertionError(log_str)
+    logging.info(f"Sweep verification passed. {report}")
+    return
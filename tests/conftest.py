@@ -1,16 +1,216 @@
+import logging.config
+
 import pytest
-from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
 
+import misc.artifacts
+import misc.cpu_profile
+import misc.grid
+import misc.logging_config
+import misc.memory_profile
+import misc.scheduler
+import misc.step_hooks
 import steps.pokedex
 
 
-@pytest.fixture(scope='function')
-def load_pokedex_page():
-    d = webdriver.Chrome()
+_oracle_key = pytest.StashKey()
+
+
+def pytest_addoption(parser):
+    parser.addoption('--proxy-server', default=None,
+                     help="Route browser traffic through a proxy, e.g. misc/fault_proxy.py's address.")
+    parser.addoption('--timing-history', default=None,
+                     help='Record test/step timings into this file. Implied by --workers.')
+    parser.addoption('--workers', type=int, default=1,
+                     help='Split the run across this many workers, longest tests first.')
+    parser.addoption('--worker-index', type=int, default=0,
+                     help='Which of the --workers this process is (0-based).')
+    parser.addoption('--schedule-run-id', default=None,
+                     help='Shared by all workers of a run so they use the same schedule.')
+    parser.addoption('--memory-profile', default=None, metavar='REPORT',
+                     help='Record memory growth around every step and write a JSON report here.')
+    parser.addoption('--profile-steps', default=None,
+                     help="Sample every test's steps: 'all' or comma-separated step names. "
+                          "Tests can opt in individually with @pytest.mark.profile.")
+    parser.addoption('--profile-dir', default='Profiles',
+                     help='Where collapsed-stack (flamegraph) files are written.')
+    parser.addoption('--artifacts-dir', default='Artifacts',
+                     help='Where failure artifacts (screenshot, HTML, console, log) are written.')
+    parser.addoption('--artifacts-keep-runs', type=int, default=10,
+                     help='Number of runs whose failure artifacts are kept.')
+    parser.addoption('--no-artifacts', action='store_true', default=False,
+                     help='Do not capture failure artifacts.')
+    parser.addoption('--oracle', default='.oracle/pokedex.sqlite',
+                     help='Expected-results oracle file; harvested from the site when its probe is stale.')
+    parser.addoption('--oracle-max-age', type=float, default=24.0,
+                     help='Hours after which the oracle is harvested again even if its probe matches.')
+    parser.addoption('--refresh-oracle', action='store_true', default=False,
+                     help='Harvest the oracle from the site regardless of its probe and age.')
+    parser.addoption('--grid-nodes', type=int, default=0,
+                     help='Run browsers on this many local chromedriver nodes (see misc/grid.py) '
+                          'instead of a single local webdriver.Chrome(). Implies --new-browser-per-test, '
+                          'since one shared browser would only ever use one node.')
+    parser.addoption('--grid-slots', type=int, default=1,
+                     help='Concurrent sessions per grid node.')
+    parser.addoption('--grid-timeout', type=float, default=300.0,
+                     help='Max seconds a test waits for a free grid slot.')
+    parser.addoption('--chromedriver', default='chromedriver',
+                     help='chromedriver executable used for grid nodes.')
+    parser.addoption('--new-browser-per-test', action='store_true', default=False,
+                     help='Start a fresh browser for every test instead of resetting the page in one shared browser.')
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'profile(steps=None): sample this test\'s steps with misc.cpu_profile.')
+    config.pluginmanager.register(
+        misc.cpu_profile.CpuProfilePlugin(
+            directory=config.getoption('--profile-dir'),
+            steps=misc.cpu_profile.parse_steps_option(config.getoption('--profile-steps')),
+        ),
+        'cpu_profile'
+    )
+
+    workers = config.getoption('--workers')
+    history_filename = config.getoption('--timing-history')
+    if workers > 1 and history_filename is None:
+        history_filename = misc.scheduler.DEFAULT_HISTORY_FILENAME
+    if history_filename is not None:
+        plugin = misc.scheduler.SchedulerPlugin(
+            history=misc.scheduler.TimingHistory(history_filename),
+            workers=workers,
+            worker_index=config.getoption('--worker-index'),
+            run_id=config.getoption('--schedule-run-id'),
+        )
+        config.pluginmanager.register(plugin, 'scheduler')
+
+    if not config.getoption('--no-artifacts'):
+        collector = misc.artifacts.ArtifactCollector(
+            directory=config.getoption('--artifacts-dir'),
+            keep_runs=config.getoption('--artifacts-keep-runs'),
+        )
+        config.pluginmanager.register(misc.artifacts.ArtifactPlugin(collector), 'artifacts')
+
+    memory_report = config.getoption('--memory-profile')
+    if memory_report is not None:
+        config.pluginmanager.register(misc.memory_profile.MemoryProfilePlugin(memory_report), 'memory_profile')
+
+    grid_nodes = config.getoption('--grid-nodes')
+    if grid_nodes > 0 and not config.getoption('collectonly'):
+        config.option.new_browser_per_test = True
+        grid = misc.grid.Grid.local(nodes=grid_nodes, slots=config.getoption('--grid-slots'),
+                                    executable=config.getoption('--chromedriver'))
+        config.pluginmanager.register(misc.grid.GridPlugin(grid), 'grid')
+    return
+
+
+def pytest_sessionstart(session):
+    # Nothing to log (or log files to reset) when only collecting.
+    if session.config.getoption('collectonly'):
+        return
+    misc.logging_config.prepare_log_files()
+    logging.config.dictConfig(misc.logging_config.config)
+    return
+
+
+def pytest_runtest_setup(item):
+    misc.step_hooks.set_current_test(item.nodeid)
+    return
+
+
+def _start_browser(config):
+    # Deferred so collection doesn't import selenium.
+    from selenium import webdriver
+
+    options = webdriver.ChromeOptions()
+    proxy_server = config.getoption('--proxy-server')
+    if proxy_server is not None:
+        options.add_argument(f"--proxy-server={proxy_server}")
+    # Lets failure artifacts include the browser console.
+    options.set_capability('goog:loggingPrefs', {'browser': 'ALL'})
+    grid_plugin = config.pluginmanager.get_plugin('grid')
+    if grid_plugin is not None:
+        d = grid_plugin.grid.start_session(lambda url: webdriver.Remote(command_executor=url, options=options),
+                                           timeout=config.getoption('--grid-timeout'))
+    else:
+        d = webdriver.Chrome(options=options)
     d.maximize_window()
-    steps.pokedex.load_page(driver=d)
-    yield d
-    d.quit()
+    return d
+
+
+def _quit_browser(config, d):
+    grid_plugin = config.pluginmanager.get_plugin('grid')
+    if grid_plugin is not None:
+        grid_plugin.grid.end_session(d)
+    else:
+        d.quit()
     return
 
 
+def _quit_browser_quietly(config, d):
+    # For a browser that may already be dead.
+    try:
+        _quit_browser(config, d)
+    except Exception as e:
+        logging.warning(f"Could not quit the browser cleanly: {e}")
+    return
+
+
+@pytest.fixture(scope='session')
+def pokedex_browser(request):
+    """
+    Holds the browser shared by the whole session ('driver'; started by the first test),
+    or None if --new-browser-per-test is given.
+    """
+    if request.config.getoption('--new-browser-per-test'):
+        yield None
+        return
+    browser = {'driver': None}
+    yield browser
+    if browser['driver'] is not None:
+        _quit_browser_quietly(request.config, browser['driver'])
+    return
+
+
+@pytest.fixture(scope='function')
+def load_pokedex_page(request, pokedex_browser):
+    if pokedex_browser is None:
+        d = _start_browser(request.config)
+        request.node.stash[misc.artifacts.driver_key] = d
+        steps.pokedex.load_page(driver=d)
+        yield d
+        _quit_browser(request.config, d)
+        return
+
+    if pokedex_browser['driver'] is None:
+        pokedex_browser['driver'] = _start_browser(request.config)
+    request.node.stash[misc.artifacts.driver_key] = pokedex_browser['driver']
+    try:
+        # Fully loads the page for the first test; later tests get a soft reset.
+        steps.pokedex.reset_page(driver=pokedex_browser['driver'])
+    except (WebDriverException, TimeoutError) as e:
+        # An earlier test may have left the browser dead or hung; don't fail every remaining test.
+        logging.warning(f"Shared browser could not be reset ({type(e).__name__}: {e}); starting a new one.")
+        _quit_browser_quietly(request.config, pokedex_browser['driver'])
+        pokedex_browser['driver'] = None
+        pokedex_browser['driver'] = _start_browser(request.config)
+        request.node.stash[misc.artifacts.driver_key] = pokedex_browser['driver']
+        steps.pokedex.load_page(driver=pokedex_browser['driver'])
+    yield pokedex_browser['driver']
+    return
+
+
+@pytest.fixture(scope='function')
+def pokedex_oracle(request, load_pokedex_page):
+    """
+    The expected-results oracle, opened (and harvested, if stale) once per session.
+    """
+    oracle = request.config.stash.get(_oracle_key, None)
+    if oracle is None:
+        oracle = steps.pokedex.build_oracle(driver=load_pokedex_page, filename=request.config.getoption('--oracle'),
+                                            max_age=request.config.getoption('--oracle-max-age') * 3600,
+                                            refresh=request.config.getoption('--refresh-oracle'))
+        request.config.stash[_oracle_key] = oracle
+        request.config.add_cleanup(oracle.close)
+        # Building changes the sort and loaded results.
+        steps.pokedex.reset_page(driver=load_pokedex_page)
+    return oracle
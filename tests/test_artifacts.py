@@ -0,0 +1,98 @@
+import base64
+import gzip
+import os
+
+import pytest
+
+import misc.artifacts
+
+
+class _FakeDriver:
+    def get_screenshot_as_base64(self):
+        return base64.b64encode(b'png').decode('ascii')
+
+    def execute_script(self, script, *args):
+        return ['<html></html>', 'https://example.com/', 'Example']
+
+    def get_log(self, log_type):
+        return [{'level': 'SEVERE', 'message': 'boom'}]
+
+
+class _FakeItem:
+    def __init__(self, funcargs=None):
+        self.funcargs = funcargs if funcargs is not None else dict()
+        self.stash = pytest.Stash()
+        return
+
+
+def _make_run(directory, name, size=100):
+    os.makedirs(os.path.join(directory, name, 'test'))
+    with open(os.path.join(directory, name, 'test', 'log.txt'), 'wb') as f:
+        f.write(b'x' * size)
+    return
+
+
+def _collector(tmp_path, **kwargs):
+    collector = misc.artifacts.ArtifactCollector(directory=str(tmp_path), **kwargs)
+    _make_run(str(tmp_path), os.path.basename(collector.run_directory))
+    return collector
+
+
+def test_run_directory_has_pid(tmp_path):
+    collector = misc.artifacts.ArtifactCollector(directory=str(tmp_path))
+    name = os.path.basename(collector.run_directory)
+    assert name.endswith(f"-{os.getpid()}")
+    assert misc.artifacts._RUN_DIRECTORY_PATTERN.match(name)
+    collector.close(prune=False)
+    return
+
+
+def test_prune_keeps_newest_runs(tmp_path):
+    for name in ('20200101-000000', '20200102-000000-5', '20200102-000000-12'):
+        _make_run(str(tmp_path), name)
+    os.makedirs(str(tmp_path / 'baselines'))
+    (tmp_path / 'notes.txt').write_text('not a run')
+    collector = _collector(tmp_path, keep_runs=2)
+    collector.close()
+    assert sorted(os.listdir(str(tmp_path))) == sorted(['20200102-000000-12', 'baselines', 'notes.txt',
+                                                        os.path.basename(collector.run_directory)])
+    return
+
+
+def test_prune_size_budget(tmp_path):
+    _make_run(str(tmp_path), '20200101-000000-1')
+    collector = _collector(tmp_path, keep_runs=10, max_total_bytes=50)
+    collector.close()
+    # Over budget, but the current run is always kept.
+    assert os.listdir(str(tmp_path)) == [os.path.basename(collector.run_directory)]
+    return
+
+
+def test_no_prune(tmp_path):
+    _make_run(str(tmp_path), '20200101-000000-1')
+    collector = _collector(tmp_path, keep_runs=0)
+    collector.close(prune=False)
+    assert len(os.listdir(str(tmp_path))) == 2
+    return
+
+
+def test_capture(tmp_path):
+    collector = misc.artifacts.ArtifactCollector(directory=str(tmp_path))
+    paths = collector.capture(_FakeDriver(), 'tests/test_x.py::test_y')
+    collector.close(prune=False)
+    assert set(paths) == {'screenshot', 'html', 'console', 'log'}
+    with open(paths['screenshot'], 'rb') as f:
+        assert f.read() == b'png'
+    with gzip.open(paths['html'], 'rt') as f:
+        assert f.read() == '<!-- https://example.com/ | Example -->\n<html></html>'
+    return
+
+
+def test_find_driver_prefers_stash():
+    stashed = _FakeDriver()
+    item = _FakeItem(funcargs={'load_pokedex_page': _FakeDriver()})
+    assert misc.artifacts._find_driver(item) is item.funcargs['load_pokedex_page']
+    item.stash[misc.artifacts.driver_key] = stashed
+    assert misc.artifacts._find_driver(item) is stashed
+    assert misc.artifacts._find_driver(_FakeItem()) is None
+    return
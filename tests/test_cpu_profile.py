@@ -0,0 +1,123 @@
+import dis
+import os
+import sys
+import threading
+import time
+
+import misc.cpu_profile
+
+
+# Stand-ins for library and page-object code, compiled under paths outside this repo.
+_SELENIUM_SOURCE = """
+def execute(event):
+    event.wait(5.0)
+
+
+def until(method, *args):
+    return method(*args)
+"""
+_PAGE_OBJECT_SOURCE = """
+class Page:
+    def spin(self, ready, stop):
+        ready.set()
+        while not stop.is_set():
+            sum(range(100))
+"""
+
+
+def _module(source, name, *path):
+    namespace = {'__name__': name}
+    exec(compile(source, os.path.join(os.sep, 'venv', 'site-packages', *path), 'exec'), namespace)
+    return namespace
+
+
+_selenium = _module(_SELENIUM_SOURCE, 'selenium.webdriver.remote.remote_connection',
+                    'selenium', 'webdriver', 'remote', 'remote_connection.py')
+_page_objects = _module(_PAGE_OBJECT_SOURCE, 'page_objects.fake', 'page_objects', 'fake.py')
+
+
+def _sleep(ready, stop):
+    ready.set()
+    while not stop.is_set():
+        time.sleep(0.5)
+
+
+def _command(ready, stop):
+    ready.set()
+    _selenium['execute'](stop)
+
+
+def _spin(ready, stop):
+    ready.set()
+    while not stop.is_set():
+        sum(range(100))
+
+
+def _spin_in_webdriver_callback(ready, stop):
+    _selenium['until'](_spin, ready, stop)
+
+
+def _sample(target):
+    """
+    :returns list of collapsed stacks, sampled from a thread running target(ready, stop).
+    """
+    ready = threading.Event()
+    stop = threading.Event()
+    thread = threading.Thread(target=target, args=(ready, stop), daemon=True)
+    thread.start()
+    ready.wait()
+    time.sleep(0.05)
+    frames = [sys._current_frames()[thread.ident] for _ in range(20)]
+    stacks = [misc.cpu_profile._collapse(i) for i in frames]
+    methods = {misc.cpu_profile._page_object_method(i) for i in frames}
+    stop.set()
+    thread.join()
+    return stacks, methods
+
+
+def test_collapse_sleep():
+    stacks, _ = _sample(_sleep)
+    assert all(i.startswith('[sleep];') and i.endswith(f"{__name__}._sleep") for i in stacks)
+    return
+
+
+def test_collapse_webdriver():
+    stacks, _ = _sample(_command)
+    assert all(i.startswith('[webdriver];') for i in stacks)
+    assert all('selenium.webdriver.remote.remote_connection.execute' in i for i in stacks)
+    return
+
+
+def test_collapse_cpu_inside_webdriver_frames():
+    # Only the innermost frames count: Python work called back from WebDriver code is [cpu].
+    stacks, _ = _sample(_spin_in_webdriver_callback)
+    assert all(i.startswith('[cpu];') for i in stacks)
+    return
+
+
+def test_page_object_attribution():
+    stacks, methods = _sample(_page_objects['Page']().spin)
+    assert methods == {'Page.spin'}
+    assert all('page_objects.fake.Page.spin' in i for i in stacks)
+    return
+
+
+def test_sleep_call_needs_a_call():
+    def log_sleep():
+        print('sleep(')
+
+    def sleep_call():
+        time.sleep(0)
+
+    for function, expected in ((log_sleep, False), (sleep_call, True)):
+        calls = [i.offset for i in dis.get_instructions(function.__code__) if i.opname.startswith('CALL')]
+        assert misc.cpu_profile._is_sleep_call(function.__code__, calls[-1]) is expected
+    return
+
+
+def test_parse_steps_option():
+    assert misc.cpu_profile.parse_steps_option(None) is None
+    assert misc.cpu_profile.parse_steps_option(' All ') == set()
+    assert misc.cpu_profile.parse_steps_option('load_page, steps.pokedex.load_all_results,,') == \
+        {'load_page', 'steps.pokedex.load_all_results'}
+    return
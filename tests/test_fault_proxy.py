@@ -0,0 +1,56 @@
+import pytest
+
+import misc.fault_proxy
+
+
+def _decisions(proxy, target, n):
+    return [(round(i.delay, 6), i.drop) for i in (proxy.decide(target) for _ in range(n))]
+
+
+def test_decide_is_deterministic():
+    routes = [misc.fault_proxy.Route(r'api', latency=0.2, jitter=0.1, slow_rate=0.2, slow_latency=1.0,
+                                     drop_rate=0.3)]
+    proxy = misc.fault_proxy.FaultProxy(routes=routes, seed=42)
+    first = _decisions(proxy, 'example.com/api/pokemon', 50)
+    proxy.reset()
+    assert _decisions(proxy, 'example.com/api/pokemon', 50) == first
+    assert _decisions(misc.fault_proxy.FaultProxy(routes=routes, seed=42), 'example.com/api/pokemon', 50) == first
+    assert _decisions(misc.fault_proxy.FaultProxy(routes=routes, seed=43), 'example.com/api/pokemon', 50) != first
+    return
+
+
+@pytest.mark.parametrize('drop_rate', [0.0, 0.3, 1.0])
+def test_decide_honours_drop_rate(drop_rate):
+    proxy = misc.fault_proxy.FaultProxy(routes=[misc.fault_proxy.Route(r'api', drop_rate=drop_rate)], seed=7)
+    drops = sum(proxy.decide('example.com/api').drop for _ in range(2000))
+    assert drops / 2000 == pytest.approx(drop_rate, abs=0.04)
+    return
+
+
+def test_decide_honours_latency():
+    route = misc.fault_proxy.Route(r'api', latency=0.5, jitter=0.1, slow_rate=0.25, slow_latency=2.0)
+    proxy = misc.fault_proxy.FaultProxy(routes=[route], seed=7)
+    delays = [proxy.decide('example.com/api').delay for _ in range(2000)]
+    slow = [i for i in delays if i > 1.0]
+    assert all(0.4 <= i <= 0.6 for i in delays if i <= 1.0)
+    assert all(2.4 <= i <= 2.6 for i in slow)
+    assert len(slow) / 2000 == pytest.approx(0.25, abs=0.04)
+    return
+
+
+def test_decide_uses_first_matching_route():
+    routes = [misc.fault_proxy.Route(r'api', drop_rate=1.0), misc.fault_proxy.Route(r'example', latency=1.0),
+              misc.fault_proxy.Route(r'xhr', latency=2.0, xhr_only=True)]
+    proxy = misc.fault_proxy.FaultProxy(routes=routes)
+    assert proxy.decide('example.com/api').drop
+    assert proxy.decide('example.com/').delay == 1.0
+    assert proxy.decide('other.com/xhr').delay == 0.0
+    assert proxy.decide('other.com/xhr', is_xhr=True).delay == 2.0
+    return
+
+
+def test_fault_random_matches_browser():
+    # Values from random() in _XHR_FAULTS_SCRIPT, run under node.
+    rng = misc.fault_proxy._fault_random('42:0:0')
+    assert [rng() for _ in range(3)] == [0.5585319006349891, 0.17814155295491219, 0.17083211545832455]
+    return
@@ -0,0 +1,178 @@
+import os
+import stat
+import sys
+import textwrap
+
+import pytest
+
+import misc.grid
+
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason='The stub node is a shebang script.')
+
+
+# Answers GET /status like chromedriver; reports not ready while <script>.busy holds its pid.
+_STUB_NODE = """\
+#!{python}
+import http.server
+import json
+import os
+import sys
+
+BUSY = __file__ + '.busy'
+
+
+def ready():
+    try:
+        with open(BUSY) as f:
+            return f.read() != str(os.getpid())
+    except FileNotFoundError:
+        return True
+
+
+port = int(next(i for i in sys.argv if i.startswith('--port=')).split('=')[1])
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = json.dumps({{'value': {{'ready': ready()}}}}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+http.server.HTTPServer(('127.0.0.1', port), Handler).serve_forever()
+"""
+
+
+@pytest.fixture
+def stub_node(tmp_path):
+    path = tmp_path / 'chromedriver'
+    path.write_text(textwrap.dedent(_STUB_NODE.format(python=sys.executable)))
+    path.chmod(path.stat().st_mode | stat.S_IXUSR)
+    return str(path)
+
+
+def _set_busy(stub_node, node, busy):
+    if busy:
+        with open(stub_node + '.busy', 'w') as f:
+            f.write(str(node._process.pid))
+    else:
+        os.remove(stub_node + '.busy')
+    return
+
+
+@pytest.fixture
+def make_grid(stub_node):
+    grids = []
+
+    def make(**kwargs):
+        # Health checks are driven by the tests through check_nodes().
+        kwargs.setdefault('health_interval', 3600.0)
+        grid = misc.grid.Grid.local(executable=stub_node, **kwargs)
+        grid.start()
+        grids.append(grid)
+        return grid
+
+    yield make
+    for grid in grids:
+        grid.stop()
+    return
+
+
+def test_dispatch_least_loaded(make_grid):
+    grid = make_grid(nodes=2, slots=2)
+    nodes = [grid.acquire(timeout=1.0) for _ in range(3)]
+    assert sorted(node.active for node in grid.nodes) == [1, 2]
+    assert len(set(nodes[:2])) == 2
+    for node in nodes:
+        grid.release(node)
+    metrics = grid.metrics()
+    assert metrics['sessions'] == 3
+    assert all(0.0 <= node['utilization'] <= 1.0 for node in metrics['nodes'].values())
+    return
+
+
+def test_acquire_timeout(make_grid):
+    grid = make_grid(nodes=1, slots=1)
+    node = grid.acquire(timeout=1.0)
+    with pytest.raises(misc.grid.GridError):
+        grid.acquire(timeout=0.2)
+    grid.release(node)
+    assert grid.acquire(timeout=1.0) is node
+    return
+
+
+def test_requeue_on_dead_node(make_grid):
+    grid = make_grid(nodes=2, slots=1)
+    dead = grid.nodes[0]
+    dead._process.kill()
+    dead._process.wait()
+
+    def factory(url):
+        if url == dead.url:
+            raise ConnectionRefusedError(url)
+        return url
+
+    assert grid.start_session(factory, timeout=1.0) == grid.nodes[1].url
+    assert grid.requeued == 1
+    assert not dead.healthy
+    return
+
+
+def test_start_timeout_stops_process(tmp_path):
+    path = tmp_path / 'hung_chromedriver'
+    pid_file = tmp_path / 'pid'
+    path.write_text(f"#!{sys.executable}\nimport os, time\n"
+                    f"open({str(pid_file)!r}, 'w').write(str(os.getpid()))\ntime.sleep(60)\n")
+    path.chmod(path.stat().st_mode | stat.S_IXUSR)
+    node = misc.grid.Node(executable=str(path))
+    with pytest.raises(misc.grid.GridError):
+        node.start(time_limit=1.0)
+    assert node._process is None
+    with pytest.raises(ProcessLookupError):
+        os.kill(int(pid_file.read_text()), 0)
+    return
+
+
+def test_restart_needs_consecutive_failures(make_grid, stub_node):
+    grid = make_grid(nodes=1, slots=1, failure_threshold=3)
+    node = grid.nodes[0]
+    process = node._process
+    _set_busy(stub_node, node, True)
+    grid.check_nodes()
+    grid.check_nodes()
+    assert node.healthy
+    _set_busy(stub_node, node, False)
+    grid.check_nodes()
+    assert node.healthy and node.consecutive_failures == 0
+
+    _set_busy(stub_node, node, True)
+    for _ in range(3):
+        grid.check_nodes()
+    assert node._process is not process
+    assert node.healthy
+    assert node.failures == 1
+    return
+
+
+def test_no_restart_with_active_sessions(make_grid, stub_node):
+    grid = make_grid(nodes=1, slots=1, failure_threshold=1)
+    node = grid.nodes[0]
+    process = node._process
+    grid.acquire(timeout=1.0)
+    _set_busy(stub_node, node, True)
+    grid.check_nodes()
+    grid.check_nodes()
+    assert not node.healthy
+    assert node._process is process
+
+    _set_busy(stub_node, node, False)
+    grid.check_nodes()
+    assert node.healthy
+    assert node._process is process
+    return
@@ -0,0 +1,87 @@
+import json
+
+import pytest
+
+import misc.memory_profile
+from misc import step_hooks
+from misc.step_hooks import step
+
+
+class _FakePageObject:
+    pass
+
+
+class _FakeWebElement:
+    pass
+
+
+_leaked = []
+
+
+@step
+def _leaky_step(driver):
+    _leaked.append((_FakePageObject(), _FakeWebElement(), _FakeWebElement(), bytearray(512 * 1024)))
+    return
+
+
+@step
+def _clean_step(driver):
+    objects = [_FakePageObject() for _ in range(10)]
+    del objects
+    return
+
+
+@step
+def _outer_step(driver):
+    _leaky_step(driver)
+    return
+
+
+@pytest.fixture
+def profiler():
+    profiler = misc.memory_profile.MemoryProfiler(leak_threshold=1024 * 1024,
+                                                  wrapper_classes=(_FakePageObject, _FakeWebElement))
+    profiler.start()
+    step_hooks.add_hook(profiler)
+    yield profiler
+    step_hooks.remove_hook(profiler)
+    profiler.stop()
+    _leaked.clear()
+    return
+
+
+def test_leaking_step_flagged(profiler):
+    for _ in range(3):
+        _leaky_step(None)
+        _clean_step(None)
+    leaks = profiler.leaks()
+    assert [(i['step'], i['kind']) for i in leaks] == [(f"{__name__}._leaky_step", 'python')]
+    assert leaks[0]['growth'] >= 3 * 512 * 1024
+    leaky = [i for i in profiler.samples if i.step.endswith('_leaky_step')]
+    assert [(i.page_object_growth, i.web_element_growth) for i in leaky] == [(1, 2)] * 3
+    assert all(i.js_heap_growth is None for i in profiler.samples)
+    return
+
+
+def test_wrappers_counted_at_outermost_step_only(profiler):
+    _outer_step(None)
+    inner, outer = profiler.samples
+    assert inner.step.endswith('_leaky_step') and outer.step.endswith('_outer_step')
+    assert inner.page_object_growth is None and inner.web_element_growth is None
+    assert (outer.page_object_growth, outer.web_element_growth) == (1, 2)
+    assert inner.python_growth > 0
+    return
+
+
+def test_write_report(profiler, tmp_path):
+    for _ in range(3):
+        _leaky_step(None)
+    filename = str(tmp_path / 'reports' / 'memory.json')
+    profiler.write_report(filename)
+    with open(filename) as f:
+        report = json.load(f)
+    assert len(report['samples']) == 3
+    assert set(report['samples'][0]) == {'test', 'step', 'python_growth', 'js_heap_growth', 'page_object_growth',
+                                         'web_element_growth', 'top_allocations'}
+    assert report['leaks'] == profiler.leaks()
+    return
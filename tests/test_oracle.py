@@ -0,0 +1,64 @@
+import pytest
+
+import misc.oracle
+
+
+_ENTRIES = [('#0001', 'Bulbasaur'), ('#0002', 'Ivysaur'), ('#0025', 'Pikachu'), ('#0026', 'Raichu')]
+
+
+def test_expected_results(tmp_path):
+    with misc.oracle.OracleStore(str(tmp_path / 'oracle.sqlite')) as oracle:
+        assert oracle.rebuild(_ENTRIES)
+        assert oracle.expected_results('chu', 'a-z') == (('#0025', 'Pikachu'), ('#0026', 'Raichu'))
+        assert oracle.expected_results('25', 'lowest number (first)') == (('#0025', 'Pikachu'),)
+        assert oracle.expected_results('', 'highest number (first)')[0] == ('#0026', 'Raichu')
+        with pytest.raises(ValueError):
+            oracle.expected_results('', 'random')
+    return
+
+
+def test_rebuild_stores_probe(tmp_path):
+    filename = str(tmp_path / 'oracle.sqlite')
+    probe = misc.oracle.probe_fingerprint(_ENTRIES[:2], _ENTRIES[:-3:-1])
+    with misc.oracle.OracleStore(filename) as oracle:
+        assert oracle.probe is None
+        oracle.rebuild(_ENTRIES, probe=probe)
+    with misc.oracle.OracleStore(filename) as oracle:
+        assert oracle.probe == probe
+        assert not oracle.rebuild(list(reversed(_ENTRIES)), probe=probe)
+    return
+
+
+def test_probe_fingerprint_depends_on_ends():
+    probe = misc.oracle.probe_fingerprint(_ENTRIES[:2], _ENTRIES[:-3:-1])
+    assert misc.oracle.probe_fingerprint(_ENTRIES[:2], _ENTRIES[:-3:-1]) == probe
+    assert misc.oracle.probe_fingerprint(_ENTRIES[:2], [('#0027', 'Sandshrew')]) != probe
+    assert misc.oracle.probe_fingerprint(_ENTRIES[:2], _ENTRIES[:-3:-1], count=4) != probe
+    return
+
+
+def test_empty_oracle(tmp_path):
+    with misc.oracle.OracleStore(str(tmp_path / 'oracle.sqlite')) as oracle:
+        with pytest.raises(misc.oracle.StaleOracleError):
+            oracle.expected_results('', 'a-z')
+    return
+
+
+def test_is_current(tmp_path, monkeypatch):
+    probe = misc.oracle.probe_fingerprint(_ENTRIES[:2], _ENTRIES[:-3:-1], count=4)
+    with misc.oracle.OracleStore(str(tmp_path / 'oracle.sqlite')) as oracle:
+        assert not oracle.is_current(probe)
+        monkeypatch.setattr(misc.oracle.time, 'time', lambda: 1000.0)
+        oracle.rebuild(_ENTRIES, probe=probe)
+        assert oracle.harvested_at == 1000.0
+        assert oracle.is_current(probe)
+        # A change in the middle of the dataset changes the count.
+        assert not oracle.is_current(misc.oracle.probe_fingerprint(_ENTRIES[:2], _ENTRIES[:-3:-1], count=5))
+
+        monkeypatch.setattr(misc.oracle.time, 'time', lambda: 1000.0 + 3600)
+        assert oracle.is_current(probe, max_age=7200)
+        assert not oracle.is_current(probe, max_age=1800)
+        # A full harvest of the same dataset makes it current again.
+        assert not oracle.rebuild(_ENTRIES, probe=probe)
+        assert oracle.is_current(probe, max_age=1800)
+    return
@@ -0,0 +1,104 @@
+import os
+
+import misc.result_snapshot
+
+
+def _snapshot(tmp_path, name, entries, chunk_size=4096):
+    filename = str(tmp_path / f"{name}.pdxs")
+    assert misc.result_snapshot.write_snapshot(filename, iter(entries), chunk_size=chunk_size) == len(entries)
+    return filename
+
+
+def test_round_trip(tmp_path):
+    entries = [(1, 'Bulbasaur'), (25, 'Pikachu'), (29, 'Nidoran♀')]
+    with misc.result_snapshot.ResultSnapshot(_snapshot(tmp_path, 'a', entries)) as snapshot:
+        assert len(snapshot) == 3
+        assert list(snapshot) == entries
+    # Spooled in several chunks.
+    entries = [(i, f"Pokemon {i}") for i in range(1, 1001)]
+    with misc.result_snapshot.ResultSnapshot(_snapshot(tmp_path, 'b', entries, chunk_size=64)) as snapshot:
+        assert list(snapshot) == entries
+    with misc.result_snapshot.ResultSnapshot(_snapshot(tmp_path, 'empty', [])) as snapshot:
+        assert list(snapshot) == []
+    return
+
+
+def test_diff_identical(tmp_path):
+    entries = [(1, 'Bulbasaur'), (2, 'Ivysaur')]
+    diff = misc.result_snapshot.diff_files(_snapshot(tmp_path, 'old', entries), _snapshot(tmp_path, 'new', entries))
+    assert diff.is_empty
+    assert str(diff) == 'No differences.'
+    return
+
+
+def test_diff_insertions_removals_renames(tmp_path):
+    old = [(1, 'Bulbasaur'), (2, 'Ivysaur'), (3, 'Venusaur')]
+    new = [(1, 'Bulbasaur'), (3, 'Venusaur (Mega)'), (4, 'Charmander')]
+    diff = misc.result_snapshot.diff_files(_snapshot(tmp_path, 'old', old), _snapshot(tmp_path, 'new', new))
+    assert diff.insertions == [(2, 4, 'Charmander')]
+    assert diff.removals == [(1, 2, 'Ivysaur')]
+    assert diff.renames == [(1, 3, 'Venusaur', 'Venusaur (Mega)')]
+    assert diff.moves == []
+    return
+
+
+def test_diff_minimal_moves(tmp_path):
+    # Moving one entry to the front reports only that entry, not everything it shifted.
+    old = [(1, 'Bulbasaur'), (2, 'Ivysaur'), (3, 'Venusaur'), (4, 'Charmander')]
+    new = [(4, 'Charmander'), (1, 'Bulbasaur'), (2, 'Ivysaur'), (3, 'Venusaur')]
+    diff = misc.result_snapshot.diff_files(_snapshot(tmp_path, 'old', old), _snapshot(tmp_path, 'new', new))
+    assert diff.moves == [(3, 0, 4, 'Charmander')]
+    assert diff.insertions == [] and diff.removals == [] and diff.renames == []
+    return
+
+
+def test_diff_reads_only_reported_names(tmp_path, monkeypatch):
+    old = [(i, f"Pokemon {i}") for i in range(1, 1001)]
+    new = list(old)
+    new[500] = (501, 'Renamed')
+    read = []
+    name_bytes = misc.result_snapshot.ResultSnapshot.name_bytes
+
+    def counting_name_bytes(self, index):
+        read.append(index)
+        return name_bytes(self, index)
+
+    monkeypatch.setattr(misc.result_snapshot.ResultSnapshot, 'name_bytes', counting_name_bytes)
+    diff = misc.result_snapshot.diff_files(_snapshot(tmp_path, 'old', old), _snapshot(tmp_path, 'new', new))
+    assert diff.renames == [(500, 501, 'Pokemon 501', 'Renamed')]
+    assert read == [500, 500]
+    return
+
+
+def test_diff_repeated_numbers(tmp_path):
+    # Forms share a number; they're told apart by occurrence.
+    old = [(493, 'Arceus'), (493, 'Arceus Fire')]
+    new = [(493, 'Arceus'), (493, 'Arceus Fire'), (493, 'Arceus Water')]
+    diff = misc.result_snapshot.diff_files(_snapshot(tmp_path, 'old', old), _snapshot(tmp_path, 'new', new))
+    assert diff.insertions == [(2, 493, 'Arceus Water')]
+    assert diff.moves == [] and diff.removals == [] and diff.renames == []
+    return
+
+
+def test_longest_increasing_subsequence():
+    lis = misc.result_snapshot._longest_increasing_subsequence
+    assert lis([]) == set()
+    assert lis([0, 1, 2]) == {0, 1, 2}
+    values = [3, 0, 1, 2]
+    indexes = lis(values)
+    assert len(indexes) == 3
+    assert [values[i] for i in sorted(indexes)] == [0, 1, 2]
+    return
+
+
+def test_snapshot_path_never_collides(tmp_path):
+    pairs = [('', 'a-z'), ('_', 'a-z'), ('%5F', 'a-z'), ('a/b', 'a-z'), ('a_b', 'a-z'), ('a%2Fb', 'a-z'),
+             ('Pika', 'a-z'), ('pika', 'a-z'), ('pika', 'A-Z'), ('a__s-b', 'c'), ('a', 'b__s-c'),
+             ('x' * 200, 'a-z'), ('x' * 201, 'a-z')]
+    paths = [misc.result_snapshot.snapshot_path(str(tmp_path), *i) for i in pairs]
+    # Distinct even on case-insensitive file systems.
+    assert len({i.lower() for i in paths}) == len(pairs)
+    assert misc.result_snapshot.snapshot_path(str(tmp_path), 'pika', 'a-z') == paths[7]
+    assert all(len(os.path.basename(i)) < 255 for i in paths)
+    assert os.path.basename(paths[3]).startswith('q-a%2Fb__s-a-z__')
+    return
@@ -0,0 +1,114 @@
+import threading
+
+import pytest
+
+import misc.scheduler
+
+
+_DURATIONS = {'t1': 8.0, 't2': 7.0, 't3': 6.0, 't4': 5.0, 't5': 4.0}
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = misc.scheduler.TimingHistory(str(tmp_path / 'history.json'), smoothing=0.5)
+    history.record(test_durations={k: [v] for k, v in _DURATIONS.items()})
+    return history
+
+
+def test_schedule_lpt(history):
+    test_ids = ['t5', 't4', 't3', 't2', 't1']
+    assignment = misc.scheduler.schedule(test_ids, 2, history)
+    # 8 | 7, then 6 -> 7, 5 -> 8, 4 -> the first worker on the 13/13 tie.
+    assert assignment == [['t5', 't4', 't1'], ['t3', 't2']]
+    loads = [misc.scheduler.predicted_load(i, history) for i in assignment]
+    assert max(loads) == 17.0
+    assert misc.scheduler.schedule(test_ids, 2, history) == assignment
+    return
+
+
+def test_schedule_covers_every_test(history):
+    test_ids = sorted(_DURATIONS) + ['new1', 'new2']
+    assignment = misc.scheduler.schedule(test_ids, 3, history)
+    assert sorted(i for worker in assignment for i in worker) == sorted(test_ids)
+    assert history.expected_test_duration('new1') == 6.0
+    return
+
+
+def test_makespan():
+    assert misc.scheduler.makespan(None) is None
+    assert misc.scheduler.makespan({'assignment': [], 'workers': dict()}) is None
+    run = {'assignment': [], 'workers': {'0': {'predicted': 10.0, 'actual': 12.0},
+                                         '1': {'predicted': 11.0, 'actual': 9.0}}}
+    assert misc.scheduler.makespan(run) == (11.0, 12.0)
+    return
+
+
+def test_place_tests(history):
+    assignment = misc.scheduler.place_tests([['t1'], ['t2', 't5']], ['t3', 't4'], history)
+    assert assignment == [['t1', 't3'], ['t2', 't5', 't4']]
+    return
+
+
+def test_assignment_for_run_places_leftovers(history):
+    def compute():
+        return misc.scheduler.schedule(['t1', 't2', 't3'], 2, history)
+
+    first = history.assignment_for_run('run', ['t1', 't2', 't3'], 2, compute)
+    assert first == [['t1'], ['t2', 't3']]
+
+    def fail():
+        raise AssertionError('The stored assignment should be reused.')
+
+    other = misc.scheduler.TimingHistory(history.filename)
+    second = other.assignment_for_run('run', ['t1', 't2', 't3', 't4'], 2, fail)
+    assert second == [['t1', 't4'], ['t2', 't3']]
+    assert misc.scheduler.TimingHistory(history.filename).run('run')['assignment'] == second
+    return
+
+
+def test_assignment_for_run_worker_mismatch(history):
+    history.assignment_for_run('run', ['t1', 't2'], 2, lambda: [['t1'], ['t2']])
+    with pytest.raises(pytest.UsageError):
+        history.assignment_for_run('run', ['t1', 't2'], 3, lambda: [['t1'], ['t2'], []])
+    return
+
+
+def test_record_ewma_under_lock(history):
+    stale = misc.scheduler.TimingHistory(history.filename, smoothing=0.5)
+    history.record(test_durations={'t1': [4.0]})
+    stale.record(test_durations={'t1': [2.0]})
+    # Both updates applied: 8 -> 6 -> 4.
+    assert misc.scheduler.TimingHistory(history.filename).expected_test_duration('t1') == 4.0
+
+    def record():
+        worker_history = misc.scheduler.TimingHistory(history.filename)
+        for _ in range(20):
+            worker_history.record(step_durations={'step': [1.0]})
+        return
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    data = misc.scheduler.TimingHistory(history.filename)._data
+    assert data['steps']['step'] == {'mean': 1.0, 'count': 80}
+    return
+
+
+def test_old_runs_pruned(tmp_path, monkeypatch):
+    history = misc.scheduler.TimingHistory(str(tmp_path / 'history.json'), max_runs=2)
+    for created, run_id in enumerate(('a', 'b', 'c')):
+        monkeypatch.setattr(misc.scheduler.time, 'time', lambda: float(created))
+        history.assignment_for_run(run_id, ['t1'], 1, lambda: [['t1']])
+    assert history.run('a') is None
+    assert history.run('b') is not None and history.run('c') is not None
+    return
+
+
+@pytest.mark.parametrize('kwargs', [{'workers': 0}, {'workers': 2, 'worker_index': 2},
+                                    {'workers': 2, 'worker_index': 0}])
+def test_plugin_usage_errors(history, kwargs):
+    with pytest.raises(pytest.UsageError):
+        misc.scheduler.SchedulerPlugin(history, **kwargs)
+    return
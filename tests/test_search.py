@@ -1,12 +1,9 @@
-import logging.config
+import logging
 
 import pytest
 
-import misc.logging_config
 import steps.pokedex
-
-
-logging.config.dictConfig(misc.logging_config.config)
+import steps.sweep
 
 
 def test_search_by_name(load_pokedex_page):
@@ -29,6 +26,35 @@ def test_search_by_number(load_pokedex_page):
     return
 
 
+def test_search_matches_oracle(load_pokedex_page, pokedex_oracle):
+    logging.info("Test begin.")
+    driver = load_pokedex_page
+    steps.pokedex.execute_search_query(driver=driver, query='bu')
+    steps.pokedex.load_all_results(driver=driver)
+    steps.pokedex.verify_search_field_results(driver=driver, query='bu', oracle=pokedex_oracle)
+    logging.info("Test passed.")
+    return
+
+
+def test_search_sweep(load_pokedex_page):
+    logging.info("Test begin.")
+    driver = load_pokedex_page
+    report = steps.sweep.run_query_sweep(driver=driver, queries=['a', 'bu', '25'])
+    steps.sweep.verify_sweep_passed(report)
+    logging.info("Test passed.")
+    return
+
+
+def test_load_all_results_scroll_health(load_pokedex_page):
+    logging.info("Test begin.")
+    driver = load_pokedex_page
+    with steps.pokedex.scroll_health_monitor(driver=driver, round_budget=10.0) as monitor:
+        steps.pokedex.load_all_results(driver=driver, monitor=monitor)
+    steps.pokedex.verify_scroll_health(driver=driver, monitor=monitor)
+    logging.info("Test passed.")
+    return
+
+
 @pytest.mark.xfail
 def test_search_fail(load_pokedex_page):
     logging.info("Test begin.")
@@ -1,14 +1,10 @@
-import logging.config
+import logging
 
 import pytest
 
-import misc.logging_config
 import steps.pokedex
 
 
-logging.config.dictConfig(misc.logging_config.config)
-
-
 def test_sort_lowest_number_first(load_pokedex_page):
     logging.info("Test begin.")
     driver = load_pokedex_page
@@ -45,6 +41,15 @@ def test_sort_za(load_pokedex_page):
     return
 
 
+def test_sort_za_matches_oracle(load_pokedex_page, pokedex_oracle):
+    logging.info("Test begin.")
+    driver = load_pokedex_page
+    steps.pokedex.set_sort_method(driver=driver, sort_method='z-a')
+    steps.pokedex.verify_sort_method(driver=driver, sort_method='z-a', oracle=pokedex_oracle)
+    logging.info("Test passed.")
+    return
+
+
 @pytest.mark.xfail
 def test_sort_az_fail(load_pokedex_page):
     logging.info("Test begin.")
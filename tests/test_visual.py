@@ -0,0 +1,83 @@
+import pytest
+
+import misc.visual
+
+
+# misc.visual imports without them; the tests need them.
+np = pytest.importorskip('numpy')
+pytest.importorskip('PIL')
+
+
+def _card(height=120, width=200):
+    # Smooth background plus a few solid shapes, roughly like a result card.
+    y, x = np.mgrid[0:height, 0:width]
+    image = np.stack([x * 255 // width, y * 255 // height, np.full_like(x, 128)], axis=2).astype(np.uint8)
+    image[20:60, 30:90] = (250, 250, 250)
+    image[80:100, 120:180] = (20, 20, 20)
+    return image
+
+
+def _change_glyph(image):
+    # About the size of one digit of '#0025'.
+    changed = image.copy()
+    changed[84:92, 130:134] = (120, 120, 120)
+    return changed
+
+
+def test_compare_images_identical():
+    image = _card()
+    assert misc.visual.compare_images('card', image, image.copy()).status == 'identical'
+    return
+
+
+def test_compare_images_similar_below_thresholds():
+    image = _card()
+    changed = image.copy()
+    changed[5, 5] = changed[5, 5] // 2
+    result = misc.visual.compare_images('card', changed, image)
+    assert result.status == 'similar'
+    assert result.changed_blocks == 0
+    return
+
+
+def test_compare_images_detects_glyph_change():
+    image = _card()
+    result = misc.visual.compare_images('card', _change_glyph(image), image)
+    assert result.status == 'different'
+    assert result.changed_blocks > 0
+    return
+
+
+def test_compare_images_shape_mismatch():
+    result = misc.visual.compare_images('card', _card(height=121), _card())
+    assert result.status == 'different'
+    assert result.changed_pixel_ratio == 1.0
+    return
+
+
+def test_perceptual_hash():
+    image = _card()
+    phash = misc.visual.perceptual_hash(image)
+    assert len(phash) == 16
+    assert misc.visual.perceptual_hash(image.copy()) == phash
+    assert misc.visual.perceptual_hash(255 - image) != phash
+    return
+
+
+def test_perceptual_hash_misses_glyph_change():
+    # Why BaselineStore doesn't trust the perceptual hash by default.
+    image = _card()
+    assert misc.visual.perceptual_hash(_change_glyph(image)) == misc.visual.perceptual_hash(image)
+    return
+
+
+def test_baseline_store_catches_glyph_change(tmp_path):
+    image = _card()
+    with misc.visual.BaselineStore(str(tmp_path)) as store:
+        assert store.compare('card', image).status == 'new'
+    with misc.visual.BaselineStore(str(tmp_path)) as store:
+        assert store.compare('card', image).status == 'identical'
+        assert store.compare('card', _change_glyph(image)).status == 'different'
+    with misc.visual.BaselineStore(str(tmp_path), trust_perceptual_hash=True) as store:
+        assert store.compare('card', _change_glyph(image)).status == 'similar'
+    return